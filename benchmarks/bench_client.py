@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# End-to-end throughput and latency of the client's hot paths against the bundled mock
+# server, without network access:
+#
+#   python -m benchmarks.bench_client [--levels N] [--latency S] [--concurrency C]
+#                                     [--parse-executor inline|thread|process]
+#
+# For each scenario it reports requests/s, items/s, mean parse time per page and the
+# peak Python memory traced during a second run.
+
+import sys
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+import hwapi
+from hwapi.mockserver import MockServer
+
+
+class Result:
+
+    def __init__(self, name, requests, items, seconds, peak_bytes, parse_seconds=None, pages=None):
+        self.name = name
+        self.requests = requests
+        self.items = items
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+        self.parse_seconds = parse_seconds
+        self.pages = pages
+
+    def __str__(self):
+        parse = "-"
+        if self.parse_seconds is not None and self.pages:
+            parse = "{:.3f} ms".format(self.parse_seconds / self.pages * 1000)
+
+        return "{:<28} {:>9.1f} req/s {:>10.1f} items/s  parse/page {:>10}  peak {:>8.1f} KiB".format(
+            self.name, self.requests / self.seconds, self.items / self.seconds, parse, self.peak_bytes / 1024
+        )
+
+
+class TimedParse:
+    # Wraps a client's page parsers to accumulate parse time.
+
+    def __init__(self, client):
+        self.seconds = 0
+        self.pages = 0
+
+        for name in ("_parse_levels", "_parse_replays"):
+            setattr(client, name, self._timed(getattr(client, name)))
+
+    def _timed(self, parse):
+        async def timed(raw, *args):
+            start = time.perf_counter()
+            try:
+                return await parse(raw, *args)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.pages += 1
+
+        return timed
+
+
+async def scenario(name, server, make_client, run):
+    # Timed and memory-traced in separate runs, since tracemalloc slows everything down.
+    client = make_client()
+    parse = TimedParse(client)
+
+    async with client:
+        await client.featured_levels()
+
+        requests_before = server.requests
+        start = time.perf_counter()
+        items = await run(client)
+        seconds = time.perf_counter() - start
+        requests = server.requests - requests_before
+
+    async with make_client() as client:
+        await client.featured_levels()
+
+        tracemalloc.start()
+        await run(client)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return Result(name, requests, items, seconds, peak, parse.seconds, parse.pages)
+
+
+async def count(iterator):
+    n = 0
+    async for _ in iterator:
+        n += 1
+    return n
+
+
+async def main_async(args):
+    server = MockServer(levels=args.levels, users=args.users, latency=args.latency)
+
+    async with server:
+        def make_client():
+            return hwapi.client(
+                useragent="hwapi-benchmark", base_url=server.url, delay=0,
+                max_in_flight=args.concurrency, user_cache_maxsize=args.users * 2,
+                parse_executor=args.parse_executor
+            )
+
+        async def levels(client):
+            return await count(client.levels("newest", "anytime"))
+
+        async def levels_prefetch(client):
+            return await count(client.levels("newest", "anytime", prefetch=args.concurrency))
+
+        async def crawl_levels(client):
+            return await count(client.crawl_levels("newest", "anytime", concurrency=args.concurrency))
+
+        async def level_replays(client):
+            level_ids = range(1, min(args.levels, 50) + 1)
+            return await count(client.crawl_level_replays(level_ids, "completion_time", concurrency=args.concurrency))
+
+        async def users(client):
+            return len(await client.users(range(1, args.users + 1), concurrency=args.concurrency))
+
+        async def replays(client):
+            replay_ids = [level_id * 1000 + 1 for level_id in range(1, min(args.levels, 200) + 1)]
+            await asyncio.gather(*[client.replay(replay_id) for replay_id in replay_ids])
+            return len(replay_ids)
+
+        scenarios = [
+            ("levels()", levels),
+            ("levels(prefetch)", levels_prefetch),
+            ("crawl_levels()", crawl_levels),
+            ("crawl_level_replays()", level_replays),
+            ("users()", users),
+            ("replay()", replays)
+        ]
+
+        for name, run in scenarios:
+            print(await scenario(name, server, make_client, run))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated server latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--parse-executor", choices=["inline", "thread", "process"], default="inline")
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main_async(args))
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
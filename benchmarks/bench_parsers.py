@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Compares the streaming listing parser against the xmltodict path it replaced.
+#
+#   python -m benchmarks.bench_parsers [--levels N] [--repeat R] [captured_page.xml ...]
+#
+# Captured pages are raw get_level.hw / replay.hw responses saved to disk; without any,
+# synthetic pages of N levels and N replays are generated.
+
+import sys
+import timeit
+import argparse
+
+import xmltodict
+
+import hwapi
+from hwapi import models
+from hwapi import parsers
+
+
+def synthetic_levels(n):
+    return "<lvs>" + "".join(
+        '<lv id="{0}" ln="Level {0}" dp="2019-01-01 12:00:00" pc="{1}" ps="{2}" vs="{3}" rg="3.21" '
+        'ui="{4}" un="user{4}"><uc>Description of level {0}</uc></lv>'.format(i, i % 12, i * 7, i % 300, i % 5000)
+        for i in range(1, n + 1)
+    ) + "</lvs>"
+
+
+def synthetic_replays(n):
+    return "<rps>" + "".join(
+        '<rp id="{0}" dc="2019-01-01 12:00:00" vs="{1}" rg="4.10" vw="{2}" ct="{3}" pc="{4}" '
+        'ui="{5}" un="user{5}"><uc>Comment {0}</uc></rp>'.format(i, i % 40, i * 3, 300 + i, i % 12, i % 5000)
+        for i in range(1, n + 1)
+    ) + "</rps>"
+
+
+def xmltodict_path(state, text, root, tag, model):
+    items = xmltodict.parse(text)[root][tag]
+    if type(items) != list:
+        items = [items]
+
+    return [model(state=state, data=item) for item in items]
+
+
+def streaming_path(state, text, tag, model):
+    return [model(state=state, data=item) for item in parsers.iter_items(tag, text)]
+
+
+def bench(name, text, root, tag, model, state, repeat):
+    old = min(timeit.repeat(lambda: xmltodict_path(state, text, root, tag, model), number=1, repeat=repeat))
+    new = min(timeit.repeat(lambda: streaming_path(state, text, tag, model), number=1, repeat=repeat))
+
+    print("{:<40} {:>6} KiB  xmltodict {:8.2f} ms  streaming {:8.2f} ms  speedup {:5.2f}x".format(
+        name, len(text) // 1024, old * 1000, new * 1000, old / new
+    ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="*", help="captured listing responses")
+    parser.add_argument("--levels", type=int, default=5000, help="items per synthetic page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    state = hwapi.client(useragent="hwapi-benchmark")
+
+    if not args.pages:
+        bench("synthetic lvs ({} levels)".format(args.levels), synthetic_levels(args.levels),
+              "lvs", "lv", models.Level, state, args.repeat)
+        bench("synthetic rps ({} replays)".format(args.levels), synthetic_replays(args.levels),
+              "rps", "rp", models.Replay, state, args.repeat)
+
+    for path in args.pages:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+
+        if "<rps" in text[:100]:
+            bench(path, text, "rps", "rp", models.Replay, state, args.repeat)
+        else:
+            bench(path, text, "lvs", "lv", models.Level, state, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Compares the lxml XPath profile extractor against the BeautifulSoup fallback.
+#
+#   python -m benchmarks.bench_profile [--repeat R] [saved_profile.html ...]
+#
+# Saved pages are profile.tjf responses; without any, a synthetic page padded with
+# navigation and comment markup of roughly real-page size is used.
+
+import sys
+import timeit
+import argparse
+
+from hwapi import parsers
+
+
+def synthetic_profile(padding=300):
+    filler = "".join(
+        '<div class="comment"><a href="/profile.tjf?uid={0}">user{0}</a><p>Nice level number {0}!</p></div>'.format(i)
+        for i in range(padding)
+    )
+    rows = "".join(
+        "<tr><td>{}:</td><td> {} </td></tr>".format(label, value)
+        for label, value in [
+            ("Date Joined", "2010-06-01"),
+            ("Email", "someone@example.com"),
+            ("Website", "http://example.com"),
+            ("Location", "Somewhere"),
+            ("Gender", "male")
+        ]
+    )
+
+    return (
+        "<html><head><title>Profile</title><script>var x = 1;</script></head><body>"
+        '<div id="nav"><ul>' + "".join("<li><a href='#'>Link {}</a></li>".format(i) for i in range(50)) + "</ul></div>"
+        "<div class=\"header\">Someone's Profile</div>"
+        '<table class="profile_table">' + rows + "</table>"
+        + filler +
+        "</body></html>"
+    )
+
+
+def bench(name, html, repeat):
+    fast = parsers.parse_profile_lxml(html, 1)
+    slow = parsers.parse_profile_soup(html, 1)
+    if fast != slow:
+        raise AssertionError("extractors disagree on {}: {!r} != {!r}".format(name, fast, slow))
+
+    old = min(timeit.repeat(lambda: parsers.parse_profile_soup(html, 1), number=1, repeat=repeat))
+    new = min(timeit.repeat(lambda: parsers.parse_profile_lxml(html, 1), number=1, repeat=repeat))
+
+    print("{:<40} {:>5} KiB  BeautifulSoup {:7.2f} ms  lxml {:7.2f} ms  speedup {:5.2f}x".format(
+        name, len(html) // 1024, old * 1000, new * 1000, old / new
+    ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="*", help="saved profile.tjf pages")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if not args.pages:
+        bench("synthetic profile", synthetic_profile(), args.repeat)
+
+    for path in args.pages:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            bench(path, f.read(), args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from . import errors
 from .client import client
-
+from .responsecache import ResponseCache
+from .searchindex import LevelIndex
+from .sync import SyncCheckpoint
+from .table import LevelTable
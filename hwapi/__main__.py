@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+#   python -m hwapi export levels -o levels.ndjson.gz --gzip --rotate-every 100000
+#   python -m hwapi export replays --level-id 1 2 3 -o replays.csv --format csv
+
+import sys
+import asyncio
+import argparse
+
+from . import export
+from . import shard
+from .client import client
+
+
+def _export_parser(subparsers):
+    parser = subparsers.add_parser("export", help="stream levels or replays to files")
+    kinds = parser.add_subparsers(dest="kind")
+    kinds.required = True
+
+    levels = kinds.add_parser("levels")
+    levels.add_argument("--sorted-by", default="newest")
+    levels.add_argument("--uploaded", default="anytime")
+
+    replays = kinds.add_parser("replays")
+    replays.add_argument("--level-id", type=int, nargs="+", required=True)
+    replays.add_argument("--sorted-by", default="newest")
+
+    for kind in (levels, replays):
+        kind.add_argument("-o", "--output", required=True)
+        kind.add_argument("--format", choices=sorted(export.WRITERS), default="ndjson")
+        kind.add_argument("--gzip", action="store_true", help="compress the output")
+        kind.add_argument("--rotate-every", type=int, default=None, help="rows per output file")
+        kind.add_argument("--batch-size", type=int, default=1000)
+        kind.add_argument("--pages", type=int, default=None, help="only the first N pages")
+        kind.add_argument("--concurrency", type=int, default=4)
+        kind.add_argument("--processes", type=int, default=1, help="crawl in N worker processes")
+        kind.add_argument("--rate", type=float, default=None, help="requests per second")
+        kind.add_argument("--useragent", default="hwapi")
+        kind.add_argument("--base-url", default="https://totaljerkface.com")
+
+
+async def _export(args):
+    pages = range(1, args.pages + 1) if args.pages is not None else None
+    columns = export.LEVEL_COLUMNS if args.kind == "levels" else export.REPLAY_COLUMNS
+
+    if args.processes > 1:
+        crawler = shard.ShardedCrawler(
+            useragent=args.useragent,
+            rate=args.rate or 1,
+            workers=args.processes,
+            base_url=args.base_url
+        )
+        if args.kind == "levels":
+            items = crawler.levels(args.sorted_by, args.uploaded, pages=pages, concurrency=args.concurrency)
+        else:
+            items = crawler.level_replays(args.level_id, args.sorted_by, pages=pages, concurrency=args.concurrency)
+
+        return await _write(args, items, columns)
+
+    async with client(useragent=args.useragent, rate=args.rate, base_url=args.base_url) as api:
+        if args.kind == "levels":
+            items = api.crawl_levels(args.sorted_by, args.uploaded, pages=pages, concurrency=args.concurrency, ordered=True)
+        else:
+            items = api.crawl_level_replays(args.level_id, args.sorted_by, pages=pages, concurrency=args.concurrency, ordered=True)
+
+        return await _write(args, items, columns)
+
+
+def _write(args, items, columns):
+    return export.export(
+        items,
+        args.output,
+        args.format,
+        batch_size=args.batch_size,
+        compress=args.gzip,
+        rotate_every=args.rotate_every,
+        columns=columns
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hwapi")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    _export_parser(subparsers)
+    args = parser.parse_args(argv)
+
+    try:
+        result = asyncio.run(_export(args))
+    except (ValueError, ImportError) as e:
+        parser.error(str(e))
+
+    print("wrote {} rows to {} file(s)".format(result["rows"], len(result["files"])), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import time
+import random
+
+from . import errors
+
+
+def backoff(attempt, base, cap):
+    # Exponential backoff with full jitter: uniform in [0, min(cap, base * 2 ** (attempt - 1))].
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class AIMDController:
+
+    # Additive-increase / multiplicative-decrease control of a RateLimiter's rate. Every
+    # healthy response adds `increase` requests/s up to max_rate. An error, or a latency
+    # above `slowdown` times the running baseline, multiplies the rate by `decrease`, at
+    # most once per `cooldown` seconds, down to min_rate.
+
+    def __init__(self, limiter, *, min_rate, max_rate, increase=0.05, decrease=0.5, slowdown=2.0, cooldown=1.0):
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("need 0 < min_rate <= max_rate, got {} and {}".format(min_rate, max_rate))
+
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slowdown = slowdown
+        self.cooldown = cooldown
+
+        self.increases = 0
+        self.decreases = 0
+
+        self._limiter = limiter
+        self._latency = None
+        self._last_decrease = 0
+
+        self.rate = min(max(limiter.rate or max_rate, min_rate), max_rate)
+        self._limiter.set_rate(self.rate)
+
+    def on_success(self, latency):
+        baseline = self._latency
+        self._latency = latency if baseline is None else 0.95 * baseline + 0.05 * latency
+
+        if baseline is not None and latency > baseline * self.slowdown:
+            self._decrease()
+        else:
+            self._set_rate(self.rate + self.increase)
+            self.increases += 1
+
+    def on_failure(self):
+        self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+
+        self._last_decrease = now
+        self._set_rate(self.rate * self.decrease)
+        self.decreases += 1
+
+    def _set_rate(self, rate):
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self._limiter.set_rate(self.rate)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "latency_baseline": self._latency,
+            "increases": self.increases,
+            "decreases": self.decreases
+        }
+
+
+class CircuitBreaker:
+
+    # Opens after `threshold` consecutive failures and rejects requests for `reset_timeout`
+    # seconds. It then lets one trial request through (half-open): success closes it,
+    # failure opens it again.
+
+    def __init__(self, endpoint, *, threshold=10, reset_timeout=30):
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened = 0
+
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        elif time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        else:
+            return "half-open"
+
+    def before_request(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial):
+            retry_after = max(0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise errors.CircuitOpenError(self.endpoint, retry_after)
+
+        if state == "half-open":
+            self._trial = True
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def abandon(self):
+        # The request ended without a verdict, e.g. it was cancelled.
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+            self._trial = False
+            self.opened += 1
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened
+        }
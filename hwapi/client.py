@@ -1,20 +1,44 @@
 # -*- coding: utf-8 -*-
 
-import time
 import xml
+import time
 import asyncio
+import weakref
+import itertools
+import collections
 
 import aiohttp
-import xmltodict
-from bs4 import BeautifulSoup
-import cachetools
 
+from . import adaptive
+from . import crawl
+from . import errors
+from . import executor
+from . import featured
+from . import leaderboard
 from . import models
+from . import paginate
+from . import parsers
+from . import ratelimit
+from . import singleflight
+from . import stats
+from . import sync
+from . import usercache
+
+
+RETRYABLE_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, errors.ServerError)
 
 
 class client:
 
-    def __init__(self, *, useragent, timeout=5, delay=1, max_tries=5, user_cache_maxsize=300, user_cache_ttl=60):
+    def __init__(self, *, useragent, timeout=5, delay=1, max_tries=5, user_cache_maxsize=None, user_cache_ttl=60,
+                 user_cache_max_bytes=8 * 1024 * 1024, user_cache_negative_ttl=6 * 60 * 60, user_cache_path=None,
+                 level_cache_maxsize=1000, level_cache_ttl=10 * 60, replay_cache_maxsize=1000, replay_cache_ttl=10 * 60,
+                 pool_size=100, pool_size_per_host=0, keepalive_timeout=30, dns_cache_ttl=300,
+                 rate=None, burst=1, max_in_flight=None, endpoint_rates=None, cache=None,
+                 featured_cache_ttl=60 * 60, base_url="https://totaljerkface.com", hooks=None,
+                 adaptive_rate=False, min_rate=0.1, max_rate=None, max_backoff=30, breaker_threshold=10,
+                 breaker_timeout=30, parse_executor="inline", parse_workers=None, token_bucket=None,
+                 priority_shares=None):
         self.SORTED_BY_POSS = ["newest", "oldest", "plays", "rating"]
         self.UPLOADED_BY_POSS = ["today", "week", "month", "anytime"]
         self.REPLAY_SORTED_BY_POSS = ["completion_time", "newest", "oldest", "rating"]
@@ -23,356 +47,649 @@ class client:
         self.timeout = timeout
         self.delay = delay
         self.max_tries = max_tries
-
-        self._last_request = 0
-        self._user_cache = cachetools.TTLCache(maxsize=user_cache_maxsize, ttl=user_cache_ttl)
-        self._featured_cache = []
-
-    async def _ensure_delay(self):
-        if time.time() - self._last_request < self.delay:
-            await asyncio.sleep(self.delay - (time.time() - self._last_request))
-
-    async def _fetch_post(self, url, payload):
-        await self._ensure_delay()
+        self.base_url = base_url.rstrip("/")
+
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session = None
+
+        if rate is None and delay > 0:
+            rate = 1 / delay
+
+        self._limiter = ratelimit.RateLimiter(
+            rate=rate,
+            burst=burst,
+            max_in_flight=max_in_flight,
+            endpoint_rates=endpoint_rates,
+            bucket=token_bucket,
+            shares=priority_shares
+        )
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+        self._breakers = {}
+
+        self._controller = None
+        if adaptive_rate:
+            if max_rate is None:
+                if self._limiter.rate is None:
+                    raise ValueError("adaptive rate control needs rate, delay or max_rate")
+                max_rate = 4 * self._limiter.rate
+
+            self._controller = adaptive.AIMDController(self._limiter, min_rate=min_rate, max_rate=max_rate)
+
+        self._stats = stats.Stats(hooks)
+        self._cache = cache
+        self._inflight = singleflight.SingleFlight()
+        self._users = weakref.WeakValueDictionary()
+        # Bounded by approximate memory; user_cache_maxsize optionally caps the count too.
+        self._user_cache = usercache.UserCache(
+            max_bytes=user_cache_max_bytes,
+            ttl=user_cache_ttl,
+            negative_ttl=user_cache_negative_ttl,
+            max_entries=user_cache_maxsize,
+            stats=self._stats.caches["user"]
+        )
+        self.user_cache_path = user_cache_path
+        if user_cache_path is not None:
+            self.load_user_cache(user_cache_path)
+        # Filled by every level/replay listing and detail response.
+        self._level_cache = stats.CountingTTLCache(
+            maxsize=level_cache_maxsize,
+            ttl=level_cache_ttl,
+            stats=self._stats.caches["level"]
+        )
+        self._replay_cache = stats.CountingTTLCache(
+            maxsize=replay_cache_maxsize,
+            ttl=replay_cache_ttl,
+            stats=self._stats.caches["replay"]
+        )
+        self._featured_cache = featured.FeaturedIndex(ttl=featured_cache_ttl)
+        self._page_sizes = {}
+
+        # A ParseExecutor passed in is shared and left running on close().
+        self._owns_parser = not isinstance(parse_executor, executor.ParseExecutor)
+        if self._owns_parser:
+            parse_executor = executor.ParseExecutor(parse_executor, workers=parse_workers)
+        self._parser = parse_executor
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=self.dns_cache_ttl is not None
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': self.useragent},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+        return self._session
+
+    async def close(self):
+        self._featured_cache.cancel()
+        if self.user_cache_path is not None:
+            self.save_user_cache(self.user_cache_path)
+        if self._owns_parser:
+            self._parser.shutdown(wait=False)
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @staticmethod
+    def _endpoint(url):
+        return url.split("?")[0].rsplit("/", 1)[-1]
+
+    async def _fetch_post(self, url, payload, priority="normal"):
+        return await self._request("POST", url, payload, priority)
+
+    async def _fetch_get(self, url, priority="normal"):
+        return await self._request("GET", url, priority=priority)
+
+    async def _request(self, method, url, payload=None, priority="normal"):
+        # priority is the class ("interactive", "normal", "bulk" or a key of
+        # priority_shares) the request queues in for the rate budget.
+        endpoint = self._endpoint(url)
+        endpoint_stats = self._stats.endpoints[endpoint]
+
+        if self._cache is not None:
+            cached = self._cache.get(url, payload)
+            if cached is not None:
+                endpoint_stats.cache_hits += 1
+                return cached
+
+        if not endpoint in self._breakers:
+            self._breakers[endpoint] = adaptive.CircuitBreaker(
+                endpoint,
+                threshold=self.breaker_threshold,
+                reset_timeout=self.breaker_timeout
+            )
+        breaker = self._breakers[endpoint]
 
         tries = 0
+        last_error = None
         while tries < self.max_tries:
-            try:
-                async with aiohttp.ClientSession(headers={'User-Agent': self.useragent}) as session:
-                    async with session.post(url, data=payload, timeout=self.timeout) as resp:
-                        self._last_request = time.time()
-                        return await resp.text()
-            except asyncio.TimeoutError:
-                tries += 1
-
-            if self.delay > 0:
-                await asyncio.sleep(self.delay * tries)
-            else:
-                await asyncio.sleep(1.5 * tries)
+            breaker.before_request()
 
-    async def _fetch_get(self, url):
-        await self._ensure_delay()
-
-        tries = 0
-        while tries < self.max_tries:
+            info = {"endpoint": endpoint, "method": method, "url": url, "payload": payload, "attempt": tries + 1}
+            start = None
+            status = None
             try:
-                async with aiohttp.ClientSession(headers={'User-Agent': self.useragent}) as session:
-                    async with session.get(url, timeout=self.timeout) as resp:
-                        self._last_request = time.time()
-                        return await resp.text()
-            except asyncio.TimeoutError:
+                async with self._limiter.limit(endpoint, priority) as permit:
+                    endpoint_stats.rate_limit_wait += permit.waited
+                    endpoint_stats.requests += 1
+                    self._stats.emit("on_request_start", info)
+
+                    start = time.perf_counter()
+                    session = self._get_session()
+                    async with session.request(method, url, data=payload) as resp:
+                        status = resp.status
+                        body = await resp.read()
+                        text = await resp.text()
+
+                latency = time.perf_counter() - start
+                endpoint_stats.responses += 1
+                endpoint_stats.status[status] += 1
+                endpoint_stats.bytes_received += len(body)
+                endpoint_stats.latency.observe(latency)
+
+                if status >= 500:
+                    raise errors.ServerError(url, status)
+
+                breaker.record_success()
+                if self._controller is not None:
+                    self._controller.on_success(latency)
+
+                info.update(status=status, latency=latency, bytes=len(body), error=None)
+                self._stats.emit("on_request_end", info)
+
+                if self._cache is not None and status == 200:
+                    self._cache.set(url, payload, text)
+
+                return text
+            except RETRYABLE_ERRORS as e:
                 tries += 1
+                last_error = e
+                endpoint_stats.errors += 1
+
+                breaker.record_failure()
+                if self._controller is not None:
+                    self._controller.on_failure()
+
+                latency = time.perf_counter() - start if start is not None else None
+                info.update(status=status, latency=latency, bytes=0, error=e)
+                self._stats.emit("on_request_end", info)
+            except BaseException:
+                breaker.abandon()
+                raise
+
+            if tries < self.max_tries:
+                endpoint_stats.retries += 1
+                await asyncio.sleep(adaptive.backoff(tries, self.delay if self.delay > 0 else 1.5, self.max_backoff))
+
+        raise errors.RetryBudgetExhausted(url, tries, last_error)
+
+    def add_hook(self, event, callback):
+        # event is "on_request_start" or "on_request_end"; callback(info) gets a dict.
+        self._stats.add_hook(event, callback)
+
+    def remove_hook(self, event, callback):
+        self._stats.remove_hook(event, callback)
+
+    def stats(self):
+        snapshot = self._stats.snapshot()
+        snapshot["caches"]["user"]["size"] = len(self._user_cache)
+        snapshot["caches"]["user"]["bytes"] = self._user_cache.bytes
+        snapshot["caches"]["user"]["negative"] = self._user_cache.negatives()
+        snapshot["caches"]["level"]["size"] = len(self._level_cache)
+        snapshot["caches"]["replay"]["size"] = len(self._replay_cache)
+        snapshot["caches"]["featured"] = self._featured_cache.stats()
+        if self._cache is not None:
+            snapshot["caches"]["responses"] = self._cache.stats()
+        snapshot["coalescing"] = self._inflight.stats()
+        snapshot["parse_executor"] = self._parser.stats()
+        snapshot["circuit_breakers"] = {endpoint: breaker.stats() for endpoint, breaker in self._breakers.items()}
+        snapshot["rate"] = self._limiter.rate
+        snapshot["priorities"] = self._limiter.stats()
+        if self._controller is not None:
+            snapshot["adaptive"] = self._controller.stats()
+        return snapshot
+
+    def coalescing_stats(self):
+        return self._inflight.stats()
+
+    async def level(self, level_id: int, fetch=False, priority="normal"):
+        if not fetch:
+            level = self._cached("level", self._level_cache, level_id)
+            if level is not None:
+                return level
 
-            if self.delay > 0:
-                await asyncio.sleep(self.delay * tries)
-            else:
-                await asyncio.sleep(1.5 * tries)
+        return await self._inflight.do(("get_level.hw", level_id), lambda: self._fetch_level(level_id, priority))
 
-    async def level(self, level_id: int):
-        await self._ensure_featured_cache()
+    async def _fetch_level(self, level_id, priority="normal"):
+        self._ensure_featured_cache()
 
         payload = {
             'action': 'get_level',
             'level_id': level_id
         }
 
-        raw_metadata = await self._fetch_post("https://totaljerkface.com/get_level.hw", payload)
-        metadata_dict = xmltodict.parse(raw_metadata)
+        raw_metadata = await self._fetch_post("{}/get_level.hw".format(self.base_url), payload, priority)
+        await self._featured_ready()
 
-        return models.Level(
-            data=metadata_dict["lvs"]["lv"],
+        with self._stats.parse_timer("level"):
+            level_data = await self._parser.run(parsers.parse_level, raw_metadata)
+
+        level = models.Level(
+            data=level_data,
             state=self
         )
+        self._level_cache[level.id] = level
+        return level
+
+    async def replay(self, replay_id: int, fetch=False, priority="normal"):
+        # A cached replay may come from a listing, which leaves its level to be fetched
+        # (or found in the level cache) on first use; fetch=True gets the combined data.
+        if not fetch:
+            replay = self._cached("replay", self._replay_cache, replay_id)
+            if replay is not None:
+                return replay
+
+        return await self._inflight.do(("replay.hw", replay_id), lambda: self._fetch_replay(replay_id, priority))
+
+    async def _fetch_replay(self, replay_id, priority="normal"):
+        # The combined data embeds a Level, whose featured flag needs the featured index.
+        self._ensure_featured_cache()
 
-    async def replay(self, replay_id: int):
         payload = {
             'action': 'get_combined',
             'replay_id': replay_id
         }
 
-        raw_metadata = await self._fetch_post("https://totaljerkface.com/replay.hw", payload)
-        metadata_dict = xmltodict.parse(raw_metadata)
+        raw_metadata = await self._fetch_post("{}/replay.hw".format(self.base_url), payload, priority)
+        await self._featured_ready()
 
-        return models.Replay(
-            data=metadata_dict["combined_data"],
+        with self._stats.parse_timer("replay"):
+            replay_data = await self._parser.run(parsers.parse_replay, raw_metadata)
+
+        replay = models.Replay(
+            data=replay_data,
             state=self
         )
+        self._replay_cache[replay.id] = replay
+        if replay._level is not None:
+            self._level_cache[replay._level.id] = replay._level
+        return replay
+
+    async def fetch_user(self, user_id: int, priority="normal"):
+        return await self.user(user_id, fetch=True, priority=priority)
+
+    def _cached(self, name, cache, key):
+        value = cache.get(key)
+        if value is None:
+            self._stats.caches[name].misses += 1
+        else:
+            self._stats.caches[name].hits += 1
+
+        return value
 
-    async def fetch_user(self, user_id: int):
-        return await self.user(user_id, force=True)
+    def _cached_user(self, user_id):
+        return self._cached("user", self._user_cache, user_id)
 
-    async def user(self, user_id: int, fetch=False):
+    async def user(self, user_id: int, fetch=False, priority="normal"):
         if not fetch:
-            if user_id in self._user_cache:
-                return self._user_cache[user_id]
+            user = self._cached_user(user_id)
+            if user is not None:
+                return user
 
-        user_page_html = await self._fetch_get("https://totaljerkface.com/profile.tjf?uid={}".format(user_id))
-        soup = BeautifulSoup(user_page_html, "lxml")
+        return await self._resolve_user(user_id, priority)
 
-        if soup.find("div", class_="header").text == "This user's account is not active.":
-            user_data = {"active": False}
-        else:
-            user_data = {"active": True}
+    def _resolve_user(self, user_id, priority="normal"):
+        # Concurrent lookups share one request, queued at the first caller's priority.
+        return self._inflight.do(("profile.tjf", user_id), lambda: self._fetch_user(user_id, priority))
 
-            # Construct user_data
-            profile_table = soup.find("table", class_="profile_table")
-            mapped_profile_table = {}
+    def save_user_cache(self, path):
+        # Returns the number of users written.
+        return self._user_cache.save(path)
 
-            for row in profile_table.find_all("tr"):
-                columns = row.find_all("td")
-                mapped_profile_table[columns[0].text.replace(":", "").lower()] = columns[1].text.strip()
+    def load_user_cache(self, path):
+        # Returns the number of users loaded from a save_user_cache() snapshot.
+        return self._user_cache.load(path, self._restore_user)
 
-            name = soup.find("div", class_="header").text.split("'s Profile")[0]
+    def _restore_user(self, user_id, data):
+        data = dict(data)
+        user = self._users.get(user_id)
+        if user is not None and data.get("active", True):
+            user._from_data(data)
+        else:
+            user = models.User(state=self, data=data)
+            if user.active:
+                self._users[user_id] = user
 
-            user_data["profile_table"] = mapped_profile_table
-            user_data["name"] = name
-            user_data["id"] = user_id
+        return user
 
-        user = models.User(
-            data=user_data,
-            state=self
-        )
+    async def users(self, user_ids, concurrency=8, fetch=False, priority="bulk"):
+        # user_ids may be a one-shot iterable; it is read twice below.
+        user_ids = list(user_ids)
+        users = {}
+        async for user_id, user in self.iter_users(user_ids, concurrency, fetch, priority):
+            users[user_id] = user
+
+        return {user_id: users[user_id] for user_id in dict.fromkeys(user_ids)}
+
+    async def iter_users(self, user_ids, concurrency=8, fetch=False, priority="bulk"):
+        # Yields (user_id, user) pairs, cached users first, the rest in completion order.
+        # Inactive users come back with id 0, hence the pairs. Stopping early stops the
+        # waiting, but fetches already started run to completion and fill the cache.
+        if concurrency < 1:
+            raise ValueError("invalid parameter for concurrency: {}".format(concurrency))
+
+        missing = collections.deque()
+        for user_id in dict.fromkeys(user_ids):
+            user = None if fetch else self._cached_user(user_id)
+            if user is not None:
+                yield user_id, user
+            else:
+                missing.append(user_id)
+
+        in_flight = {}
+        try:
+            while missing or in_flight:
+                while missing and len(in_flight) < concurrency:
+                    user_id = missing.popleft()
+                    in_flight[asyncio.ensure_future(self._resolve_user(user_id, priority))] = user_id
+
+                done, _ = await asyncio.wait(list(in_flight), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield in_flight.pop(task), task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _fetch_user(self, user_id, priority="normal"):
+        user_page_html = await self._fetch_get("{}/profile.tjf?uid={}".format(self.base_url, user_id), priority)
+        with self._stats.parse_timer("profile"):
+            user_data = await self._parser.run(parsers.parse_profile, user_page_html, user_id)
+
+        user = self._users.get(user_id)
+        if user is not None and user_data["active"]:
+            user._from_data(user_data)
+        else:
+            user = models.User(
+                data=user_data,
+                state=self
+            )
+
+            if user_data["active"]:
+                self._users[user_id] = user
 
         self._user_cache[user_id] = user
         return user
 
-    async def user_levels(self, user_id: int, sorted_by, uploaded, page=1, single=True):
+    def user_levels(self, user_id: int, sorted_by, uploaded, page=1, single=True, prefetch=0, priority="normal"):
         if not sorted_by in self.SORTED_BY_POSS:
             raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
 
         if not uploaded in self.UPLOADED_BY_POSS:
             raise ValueError("invalid parameter for uploaded: {}".format(uploaded))
 
-        await self._ensure_featured_cache()
+        params = {
+            'user_id': user_id,
+            'action': 'get_pub_by_user',
+            'uploaded': uploaded,
+            'sortby': sorted_by
+        }
+        return self._paginate(paginate.Cursor("get_level.hw", params, page), single, prefetch, priority)
+
+    @staticmethod
+    def _levels_payload(sorted_by, uploaded, page):
+        return {
+            'action': 'get_all',
+            'uploaded': uploaded,
+            'sortby': sorted_by,
+            'page': page
+        }
 
-        exhausted = False
-        previous_batch = []
-        while not exhausted:
-            payload = {
-                'page': page,
-                'user_id': user_id,
-                'action': 'get_pub_by_user',
-                'uploaded': uploaded,
-                'sortby': sorted_by
-            }
+    @staticmethod
+    def _level_replays_payload(level_id, sorted_by, page):
+        return {
+            'action': 'get_all_by_level',
+            'level_id': level_id,
+            'page': page,
+            'sortby': sorted_by
+        }
 
-            raw_metadata = await self._fetch_post("https://totaljerkface.com/get_level.hw", payload)
+    async def _parse_levels(self, raw_metadata):
+        # Returns None if the page isn't a well-formed listing.
+        try:
+            with self._stats.parse_timer("levels"):
+                levels = await self._parser.run(parsers.parse_levels, raw_metadata)
+        except xml.parsers.expat.ExpatError:
+            return None
+
+        levels = [models.Level(state=self, data=level) for level in levels]
+        for level in levels:
+            self._level_cache[level.id] = level
+        return levels
+
+    async def _parse_replays(self, raw_metadata, level_id=None):
+        # level_id is the level whose listing this is, if known.
+        try:
+            with self._stats.parse_timer("replays"):
+                replays = await self._parser.run(parsers.parse_replays, raw_metadata)
+        except xml.parsers.expat.ExpatError:
+            return None
+
+        replays = [models.Replay(state=self, data=replay, level_id=level_id) for replay in replays]
+        for replay in replays:
+            self._replay_cache[replay.id] = replay
+        return replays
+
+    def levels(self, sorted_by, uploaded, page=1, single=False, prefetch=0, priority="normal"):
+        if not sorted_by in self.SORTED_BY_POSS:
+            raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
 
-            try:
-                metadata_dict = xmltodict.parse(raw_metadata)
-            except xml.parsers.expat.ExpatError:
-                return
-                yield
-
-            if metadata_dict["lvs"]:
-                if type(metadata_dict["lvs"]["lv"]) == list:
-                    output = []
-                    for level in metadata_dict["lvs"]["lv"]:
-                        parsed_level = models.Level(
-                            state=self,
-                            data=level
-                        )
-                        output.append(parsed_level)
-
-                    if output == previous_batch:
-                        exhausted = True
-                    else:
-                        previous_batch = output
-                        for level in output:
-                            yield level
-                else:
-                    exhausted = True
-                    yield models.Level(state=self, data=metadata_dict["lvs"]["lv"])
-            else:
-                exhausted = True
+        if not uploaded in self.UPLOADED_BY_POSS:
+            raise ValueError("invalid parameter for uploaded: {}".format(uploaded))
 
-            if single:
-                exhausted = True
-            else:
-                page += 1
+        params = self._levels_payload(sorted_by, uploaded, page)
+        del params['page']
+        return self._paginate(paginate.Cursor("get_level.hw", params, page), single, prefetch, priority)
+
+    def level_replays(self, level_id: int, sorted_by, page=1, single=False, prefetch=0, priority="normal"):
+        if not sorted_by in self.REPLAY_SORTED_BY_POSS:
+            raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
 
-    async def levels(self, sorted_by, uploaded, page=1, single=False):
+        params = self._level_replays_payload(level_id, sorted_by, page)
+        del params['page']
+        return self._paginate(paginate.Cursor("replay.hw", params, page), single, prefetch, priority)
+
+    def resume(self, cursor, prefetch=0, priority="normal"):
+        # Continues a listing from a Cursor or its to_dict() form.
+        if isinstance(cursor, dict):
+            cursor = paginate.Cursor.from_dict(cursor)
+
+        return self._paginate(cursor, False, prefetch, priority)
+
+    def _paginate(self, cursor, single, prefetch, priority="normal"):
+        replays = cursor.endpoint == "replay.hw"
+
+        def parse_page(raw_metadata):
+            if replays:
+                return self._parse_replays(raw_metadata, cursor.params.get("level_id"))
+            return self._parse_levels(raw_metadata)
+
+        async def fetch_page(page):
+            if not replays:
+                self._ensure_featured_cache()
+
+            raw_metadata = await self._fetch_post("{}/{}".format(self.base_url, cursor.endpoint), cursor.payload(page), priority)
+            if not replays:
+                await self._featured_ready()
+            return raw_metadata
+
+        return paginate.Paginator(
+            cursor,
+            fetch_page,
+            parse_page,
+            prefetch=prefetch,
+            single=single,
+            page_sizes=self._page_sizes
+        )
+
+    async def crawl_levels(self, sorted_by, uploaded, pages=None, concurrency=4, ordered=False, priority="bulk"):
         if not sorted_by in self.SORTED_BY_POSS:
             raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
 
         if not uploaded in self.UPLOADED_BY_POSS:
             raise ValueError("invalid parameter for uploaded: {}".format(uploaded))
 
-        await self._ensure_featured_cache()
+        self._ensure_featured_cache()
 
-        exhausted = False
-        previous_batch = []
-        while not exhausted:
-            payload = {
-                'action': 'get_all',
-                'uploaded': uploaded,
-                'sortby': sorted_by,
-                'page': page
-            }
+        async def fetch_page(key, page):
+            payload = self._levels_payload(sorted_by, uploaded, page)
+            raw_metadata = await self._fetch_post("{}/get_level.hw".format(self.base_url), payload, priority)
+            await self._featured_ready()
+            return raw_metadata
 
-            raw_metadata = await self._fetch_post("https://totaljerkface.com/get_level.hw", payload)
+        streams = {None: pages if pages is not None else itertools.count(1)}
+        def parse_page(key, raw_metadata):
+            return self._parse_levels(raw_metadata)
 
-            try:
-                metadata_dict = xmltodict.parse(raw_metadata)
-            except xml.parsers.expat.ExpatError:
-                return
-                yield
-
-            if type(metadata_dict["lvs"]["lv"]) == list:
-                output = []
-                for level in metadata_dict["lvs"]["lv"]:
-                    parsed_level = models.Level(
-                        state=self,
-                        data=level
-                    )
-                    output.append(parsed_level)
-
-                if output == previous_batch:
-                    exhausted = True
-                else:
-                    previous_batch = output
-                    for level in output:
-                        yield level
-            else:
-                exhausted = True
-                yield models.Level(state=self, data=metadata_dict["lvs"]["lv"])
+        async for level in crawl.crawl(
+            streams, fetch_page, parse_page, concurrency=concurrency, ordered=ordered,
+            page_sizes=self._page_sizes, page_key=("get_level.hw", "get_all")
+        ):
+            yield level
 
-            if single:
-                exhausted = True
-            else:
-                page += 1
-
-    async def level_replays(self, level_id: int, sorted_by, page=1, single=False):
+    async def crawl_level_replays(self, level_ids, sorted_by, pages=None, concurrency=4, ordered=False, priority="bulk"):
         if not sorted_by in self.REPLAY_SORTED_BY_POSS:
             raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
 
-        exhausted = False
-        previous_batch = []
-        while not exhausted:
-            payload = {
-                'action': 'get_all_by_level',
-                'level_id': level_id,
-                'page': page,
-                'sortby': sorted_by
-            }
-
-            raw_metadata = await self._fetch_post("https://totaljerkface.com/replay.hw", payload)
+        def fetch_page(level_id, page):
+            payload = self._level_replays_payload(level_id, sorted_by, page)
+            return self._fetch_post("{}/replay.hw".format(self.base_url), payload, priority)
 
-            try:
-                metadata_dict = xmltodict.parse(raw_metadata)
-            except xml.parsers.expat.ExpatError:
-                return
-                yield
-
-            if "rp" in metadata_dict["rps"]:
-                if type(metadata_dict["rps"]["rp"]) == list:
-                    output = []
-                    for level in metadata_dict["rps"]["rp"]:
-                        parsed_replay = models.Replay(
-                            state=self,
-                            data=level
-                        )
-                        output.append(parsed_replay)
-
-                    if output == previous_batch:
-                        exhausted = True
-                    else:
-                        previous_batch = output
-                        for replay in output:
-                            yield replay
-                else:
-                    exhausted = True
-                    yield models.Replay(state=self, data=metadata_dict["rps"]["rp"])
-            else:
-                exhausted = True
+        streams = {}
+        for level_id in level_ids:
+            streams[level_id] = pages if pages is not None else itertools.count(1)
 
-            if single:
-                exhausted = True
-            else:
-                page += 1
+        def parse_page(level_id, raw_metadata):
+            return self._parse_replays(raw_metadata, level_id)
 
-    async def featured_levels(self, fetch=True):
-        if len(self._featured_cache) > 0:
-            return self._featured_cache
-        else:
-            payload = {'action': 'get_featured'}
+        async for replay in crawl.crawl(
+            streams, fetch_page, parse_page, concurrency=concurrency, ordered=ordered,
+            page_sizes=self._page_sizes, page_key=("replay.hw", "get_all_by_level")
+        ):
+            yield replay
 
-            raw_metadata = await self._fetch_post("https://totaljerkface.com/get_level.hw", payload)
-            metadata_dict = xmltodict.parse(raw_metadata)
+    async def sync_levels(self, checkpoint, uploaded="anytime", prefetch=0, priority="bulk"):
+        # Yields levels uploaded since the last completed sync recorded in checkpoint, newest first.
+        if not uploaded in self.UPLOADED_BY_POSS:
+            raise ValueError("invalid parameter for uploaded: {}".format(uploaded))
 
-            featured_levels = []
-            for level in metadata_dict["lvs"]["lv"]:
-                level["featured"] = True
-                parsed_level = models.Level(
-                    state=self,
-                    data=level
-                )
-                featured_levels.append(parsed_level)
+        self._ensure_featured_cache()
+
+        async def fetch_page(page):
+            payload = self._levels_payload("newest", uploaded, page)
+            raw_metadata = await self._fetch_post("{}/get_level.hw".format(self.base_url), payload, priority)
+            await self._featured_ready()
+            return raw_metadata
+
+        key = "levels:{}".format(uploaded)
+        async for level in sync.sync(
+            checkpoint, key, fetch_page, self._parse_levels, date_field="date_published", prefetch=prefetch,
+            page_sizes=self._page_sizes, page_key=("get_level.hw", "get_all")
+        ):
+            yield level
+
+    async def sync_level_replays(self, level_id: int, checkpoint, prefetch=0, priority="bulk"):
+        def fetch_page(page):
+            payload = self._level_replays_payload(level_id, "newest", page)
+            return self._fetch_post("{}/replay.hw".format(self.base_url), payload, priority)
+
+        def parse_page(raw_metadata):
+            return self._parse_replays(raw_metadata, level_id)
+
+        key = "level_replays:{}".format(level_id)
+        async for replay in sync.sync(
+            checkpoint, key, fetch_page, parse_page, date_field="date_created", prefetch=prefetch,
+            page_sizes=self._page_sizes, page_key=("replay.hw", "get_all_by_level")
+        ):
+            yield replay
+
+    async def top_replays(self, levels, k=10, by="completion_time", concurrency=8, priority="bulk"):
+        # The best k replays across levels, by "completion_time" (fastest) or "rating".
+        return await leaderboard.top_replays(self, levels, k=k, by=by, concurrency=concurrency, priority=priority)
+
+    async def featured_levels(self, fetch=False):
+        if fetch or not self._featured_cache.populated:
+            await self._featured_cache.refresh(self._fetch_featured_levels)
+        else:
+            self._ensure_featured_cache()
 
-            self._featured_cache = featured_levels
-            return featured_levels
+        return self._featured_cache.levels()
 
     async def fetch_featured_levels(self):
         return await self.featured_levels(fetch=True)
 
-    async def _ensure_featured_cache(self):
-        if not len(self._featured_cache) > 0:
-            await self.featured_levels()
+    async def _fetch_featured_levels(self):
+        payload = {'action': 'get_featured'}
 
-    async def _search(self, search_by, term, sorted_by, uploaded, page=1, single=False):
-        if not sorted_by in self.SORTED_BY_POSS:
-            raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
+        raw_metadata = await self._fetch_post("{}/get_level.hw".format(self.base_url), payload)
 
-        if not uploaded in self.UPLOADED_BY_POSS:
-            raise ValueError("invalid parameter for uploaded: {}".format(uploaded))
+        with self._stats.parse_timer("featured"):
+            levels = await self._parser.run(parsers.parse_levels, raw_metadata)
 
-        await self._ensure_featured_cache()
+        featured_levels = []
+        for level in levels:
+            level["featured"] = True
+            parsed_level = models.Level(
+                state=self,
+                data=level
+            )
+            featured_levels.append(parsed_level)
+            self._level_cache[parsed_level.id] = parsed_level
 
-        exhausted = False
-        previous_batch = []
-        while not exhausted:
-            payload = {
-                'page': page,
-                'uploaded': uploaded,
-                'sterm': term,
-                'action': 'search_by_{}'.format(search_by),
-                'sortby': sorted_by
-            }
+        return featured_levels
 
-            raw_metadata = await self._fetch_post("https://totaljerkface.com/get_level.hw", payload)
+    def _ensure_featured_cache(self):
+        # Starts a background refresh if the index is empty or stale, without waiting.
+        if self._featured_cache.stale:
+            self._featured_cache.refresh(self._fetch_featured_levels)
 
-            try:
-                metadata_dict = xmltodict.parse(raw_metadata)
-            except xml.parsers.expat.ExpatError:
-                return
-                yield
-
-            if "lv" in metadata_dict["lvs"]:
-                if type(metadata_dict["lvs"]["lv"]) == list:
-                    output = []
-                    for level in metadata_dict["lvs"]["lv"]:
-                        parsed_level = models.Level(
-                            state=self,
-                            data=level
-                        )
-                        output.append(parsed_level)
-
-                    if output == previous_batch:
-                        exhausted = True
-                    else:
-                        previous_batch = output
-                        for level in output:
-                            yield level
-                else:
-                    exhausted = True
-                    yield models.Level(state=self, data=metadata_dict["lvs"]["lv"])
-            else:
-                exhausted = True
+    async def _featured_ready(self):
+        if not self._featured_cache.populated:
+            await self._featured_cache.refresh(self._fetch_featured_levels)
 
-            if single:
-                exhausted = True
-            else:
-                page += 1
+    def _search(self, search_by, term, sorted_by, uploaded, page=1, single=False, prefetch=0, priority="normal"):
+        if not sorted_by in self.SORTED_BY_POSS:
+            raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
+
+        if not uploaded in self.UPLOADED_BY_POSS:
+            raise ValueError("invalid parameter for uploaded: {}".format(uploaded))
+
+        params = {
+            'uploaded': uploaded,
+            'sterm': term,
+            'action': 'search_by_{}'.format(search_by),
+            'sortby': sorted_by
+        }
+        return self._paginate(paginate.Cursor("get_level.hw", params, page), single, prefetch, priority)
 
     def search_by_level(self, *args, **kwargs):
         return self._search("name", *args, **kwargs)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+
+from .paginate import past_end, is_last, learn_page_size
+
+
+class _Stream:
+
+    # Pages arrive out of order, so the end of the listing is worked out from the pages
+    # seen so far, with the rules of paginate.Paginator. Only pages from just below the
+    # oldest unfinished one are remembered, so memory doesn't grow with the listing.
+
+    def __init__(self, key, pages, page_sizes, page_key):
+        self.key = key
+        self.pages = iter(pages)
+        self.end = None
+
+        self.page_sizes = page_sizes
+        self.page_key = page_key
+        self.largest = 0
+        self.lengths = {}
+        self.ids = {}
+        self.first_page_with = {}
+
+        self.scheduled = collections.deque()
+        self.last_scheduled = 0
+        self.buffer = {}
+        self.yielded = {}
+
+    def _learn(self, page):
+        # A page followed by one with new items wasn't the last, so it was full.
+        if page in self.ids and page + 1 in self.ids and not past_end(self.ids[page + 1], self.ids[page]):
+            learn_page_size(self.page_sizes, self.page_key, self.lengths[page])
+
+    def observe(self, page, items):
+        # Returns the last page of the listing if this page reveals it.
+        ids = frozenset(item.id for item in items)
+        if past_end(ids, self.ids.get(page - 1, frozenset())):
+            return page - 1
+
+        if ids in self.first_page_with:
+            # Past the end the server keeps repeating the last page.
+            return min(self.first_page_with[ids], page)
+        self.first_page_with[ids] = page
+
+        self.ids[page] = ids
+        self.lengths[page] = len(items)
+        self.largest = max(self.largest, len(items))
+        self._learn(page - 1)
+        self._learn(page)
+
+        page_size = self.page_sizes.get(self.page_key)
+        if page_size is not None or len(self.lengths) > 1:
+            page_size = max(self.largest, page_size or 0)
+        short_pages = [p for p, length in self.lengths.items() if is_last(length, page_size)]
+        if short_pages:
+            return min(short_pages)
+
+        return None
+
+    def unseen(self, page, items):
+        # Newer uploads push items onto the next page while a listing is crawled, so
+        # items already yielded from a neighbouring page are skipped.
+        neighbours = self.yielded.get(page - 1, frozenset()) | self.yielded.get(page + 1, frozenset())
+        self.yielded[page] = frozenset(item.id for item in items)
+        return [item for item in items if not item.id in neighbours]
+
+    def forget(self):
+        # Drops what is known about pages that no unfinished page can need any more.
+        oldest = self.scheduled[0] if self.scheduled else self.last_scheduled + 1
+        for pages in (self.ids, self.lengths, self.yielded):
+            for page in [p for p in pages if p < oldest - 1]:
+                del pages[page]
+
+        for ids in [ids for ids, page in self.first_page_with.items() if page < oldest - 1]:
+            del self.first_page_with[ids]
+
+
+async def crawl(streams, fetch_page, parse_page, *, concurrency=4, ordered=False, page_sizes=None, page_key=None):
+    # streams maps a key to an ascending iterable of page numbers. fetch_page(key, page)
+    # returns the raw response; parse_page(key, raw) is a coroutine returning a list of
+    # models, or None if unparseable. page_sizes and page_key share the learned page size
+    # of these listings with paginate.Paginator.
+    if concurrency < 1:
+        raise ValueError("invalid parameter for concurrency: {}".format(concurrency))
+
+    page_sizes = page_sizes if page_sizes is not None else {}
+    active = collections.deque(_Stream(key, pages, page_sizes, page_key) for key, pages in streams.items())
+    in_flight = {}
+
+    def set_end(stream, end):
+        if stream.end is not None and stream.end <= end:
+            return
+
+        stream.end = end
+        for task, (task_stream, page) in in_flight.items():
+            if task_stream is stream and page > end:
+                task.cancel()
+
+        stream.scheduled = collections.deque(p for p in stream.scheduled if p <= end)
+        for page in [p for p in stream.buffer if p > end]:
+            del stream.buffer[page]
+
+    try:
+        while True:
+            while len(in_flight) < concurrency and active:
+                stream = active.popleft()
+                page = next(stream.pages, None)
+                if page is None or (stream.end is not None and page > stream.end):
+                    continue
+
+                task = asyncio.ensure_future(fetch_page(stream.key, page))
+                in_flight[task] = (stream, page)
+                stream.scheduled.append(page)
+                stream.last_scheduled = page
+                active.append(stream)
+
+            if not in_flight:
+                break
+
+            done, _ = await asyncio.wait(list(in_flight), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stream, page = in_flight.pop(task)
+                if task.cancelled() or (stream.end is not None and page > stream.end):
+                    continue
+
+                items = await parse_page(stream.key, task.result())
+                if items is None:
+                    items = []
+
+                end = stream.observe(page, items)
+                if end is not None:
+                    set_end(stream, end)
+
+                if stream.end is not None and page > stream.end:
+                    continue
+
+                if not ordered:
+                    stream.scheduled.remove(page)
+                    items = stream.unseen(page, items)
+                    stream.forget()
+                    for item in items:
+                        yield item
+                    continue
+
+                stream.buffer[page] = items
+                while stream.scheduled and stream.scheduled[0] in stream.buffer:
+                    ready = stream.scheduled.popleft()
+                    items = stream.unseen(ready, stream.buffer.pop(ready))
+                    stream.forget()
+                    for item in items:
+                        yield item
+    finally:
+        for task in in_flight:
+            task.cancel()
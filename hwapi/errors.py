@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+
+class HWAPIException(Exception):
+    pass
+
+
+class OfflineCacheMiss(HWAPIException):
+
+    def __init__(self, url, payload=None):
+        self.url = url
+        self.payload = payload
+        super().__init__("no cached response for {} in offline mode".format(url if payload is None else (url, payload)))
+
+
+class ServerError(HWAPIException):
+
+    def __init__(self, url, status):
+        self.url = url
+        self.status = status
+        super().__init__("{} returned HTTP {}".format(url, status))
+
+
+class RetryBudgetExhausted(HWAPIException):
+
+    def __init__(self, url, attempts, last_error):
+        self.url = url
+        self.attempts = attempts
+        self.last_error = last_error
+        super().__init__("giving up on {} after {} attempts: {!r}".format(url, attempts, last_error))
+
+
+class CircuitOpenError(HWAPIException):
+
+    def __init__(self, endpoint, retry_after):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__("circuit for {} is open, retry in {:.1f}s".format(endpoint, retry_after))
+
+
+class WorkerError(HWAPIException):
+
+    def __init__(self, shard, details):
+        self.shard = shard
+        self.details = details
+        super().__init__("worker for shard {} failed:\n{}".format(shard, details))
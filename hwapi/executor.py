@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import concurrent.futures
+
+
+MODES = ("inline", "thread", "process")
+
+
+class ParseExecutor:
+
+    # Runs parse functions inline on the event loop, or in a thread or process pool.
+    # Functions and their results must be picklable for "process", so they take raw
+    # response text and return plain data. Texts shorter than inline_below characters
+    # are parsed inline, where a pool round trip would cost more than the parse.
+
+    def __init__(self, mode="inline", *, workers=None, inline_below=1024):
+        if not mode in MODES:
+            raise ValueError("invalid parameter for mode: {}".format(mode))
+
+        self.mode = mode
+        self.workers = workers
+        self.inline_below = inline_below
+
+        self.inline = 0
+        self.offloaded = 0
+
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.mode == "thread":
+                self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+        return self._pool
+
+    async def run(self, func, text, *args):
+        if self.mode == "inline" or text is None or len(text) < self.inline_below:
+            self.inline += 1
+            return func(text, *args)
+
+        self.offloaded += 1
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._get_pool(), func, text, *args)
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "inline": self.inline,
+            "offloaded": self.offloaded
+        }
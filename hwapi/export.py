@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import gzip
+import json
+
+from . import models
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+LEVEL_COLUMNS = (
+    ("id", "int"), ("name", "str"), ("author_id", "int"), ("author_name", "str"),
+    ("character", "int"), ("plays", "int"), ("votes", "int"), ("weighted_rating", "float"),
+    ("average_rating", "float"), ("description", "str"), ("date_published", "str"), ("featured", "bool")
+)
+
+REPLAY_COLUMNS = (
+    ("id", "int"), ("level_id", "int"), ("author_id", "int"), ("author_name", "str"),
+    ("character", "int"), ("votes", "int"), ("weighted_rating", "float"), ("average_rating", "float"),
+    ("views", "int"), ("completion_time", "float"), ("comment", "str"), ("date_created", "str")
+)
+
+def _columns(item, row):
+    if isinstance(item, models.Level):
+        return LEVEL_COLUMNS
+    elif isinstance(item, models.Replay):
+        return REPLAY_COLUMNS
+    else:
+        # Plain dicts: column types are taken from the first row.
+        kinds = {bool: "bool", int: "int", float: "float"}
+        return tuple((name, kinds.get(type(value), "str")) for name, value in row.items())
+
+
+def _split_path(path):
+    # "levels.ndjson.gz" -> ("levels", ".ndjson.gz")
+    suffix = ""
+    if path.endswith(".gz"):
+        path, suffix = path[:-3], ".gz"
+
+    root, ext = os.path.splitext(path)
+    return root, ext + suffix
+
+
+class _Writer:
+
+    # Writes batches of row dicts, starting a new file every `rotate_every` rows
+    # ("levels.ndjson" becomes "levels-00000.ndjson", "levels-00001.ndjson", ...).
+
+    def __init__(self, path, columns, *, compress=False, rotate_every=None):
+        if rotate_every is not None and rotate_every < 1:
+            raise ValueError("invalid parameter for rotate_every: {}".format(rotate_every))
+
+        self.path = path
+        self.columns = columns
+        self.compress = compress
+        self.rotate_every = rotate_every
+
+        self.paths = []
+        self.rows = 0
+
+        self._file = None
+        self._file_rows = 0
+
+    def _next_path(self):
+        if self.rotate_every is None:
+            return self.path
+
+        root, ext = _split_path(self.path)
+        return "{}-{:05d}{}".format(root, len(self.paths), ext)
+
+    def write_batch(self, rows):
+        while rows:
+            if self._file is None or (self.rotate_every is not None and self._file_rows >= self.rotate_every):
+                self._rotate()
+
+            n = len(rows)
+            if self.rotate_every is not None:
+                n = min(n, self.rotate_every - self._file_rows)
+
+            self._write(rows[:n])
+            self._file_rows += n
+            self.rows += n
+            rows = rows[n:]
+
+    def _rotate(self):
+        self._close_file()
+
+        path = self._next_path()
+        self._file = self._open(path)
+        self._file_rows = 0
+        self.paths.append(path)
+
+    def _text_file(self, path, newline):
+        if self.compress:
+            return gzip.open(path, "wt", encoding="utf-8", newline=newline)
+        else:
+            return open(path, "w", encoding="utf-8", newline=newline)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        # An empty export still leaves an (empty) file behind.
+        if not self.paths:
+            self._rotate()
+
+        self._close_file()
+
+
+class NDJSONWriter(_Writer):
+
+    def _open(self, path):
+        return self._text_file(path, "\n")
+
+    def _write(self, rows):
+        self._file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+
+class CSVWriter(_Writer):
+
+    def _open(self, path):
+        f = self._text_file(path, "")
+        self._csv = csv.DictWriter(f, fieldnames=[name for name, _ in self.columns], extrasaction="ignore")
+        self._csv.writeheader()
+        return f
+
+    def _write(self, rows):
+        self._csv.writerows(rows)
+
+
+class ParquetWriter(_Writer):
+
+    # Each batch becomes a row group. compress selects gzip instead of snappy.
+
+    def __init__(self, *args, **kwargs):
+        if pyarrow is None:
+            raise ImportError("parquet export needs pyarrow (pip install hwapi[parquet])")
+
+        super().__init__(*args, **kwargs)
+
+        types = {"int": pyarrow.int64(), "str": pyarrow.string(), "float": pyarrow.float64(), "bool": pyarrow.bool_()}
+        self._schema = pyarrow.schema([(name, types[kind]) for name, kind in self.columns])
+
+    def _open(self, path):
+        compression = "gzip" if self.compress else "snappy"
+        return pyarrow.parquet.ParquetWriter(path, self._schema, compression=compression)
+
+    def _write(self, rows):
+        data = {name: [row.get(name) for row in rows] for name in self._schema.names}
+        self._file.write_table(pyarrow.Table.from_pydict(data, schema=self._schema))
+
+
+WRITERS = {"ndjson": NDJSONWriter, "csv": CSVWriter, "parquet": ParquetWriter}
+
+
+async def export(items, path, format="ndjson", *, batch_size=1000, compress=False, rotate_every=None, columns=None):
+    # Writes an async iterable of Levels, Replays (via to_dict) or plain dicts, holding at
+    # most batch_size rows in memory. columns, a tuple of (name, type) pairs, overrides the
+    # columns picked from the first item. Returns {"rows": ..., "files": [...]}.
+    if not format in WRITERS:
+        raise ValueError("invalid parameter for format: {}".format(format))
+
+    if batch_size < 1:
+        raise ValueError("invalid parameter for batch_size: {}".format(batch_size))
+
+    if format == "parquet" and pyarrow is None:
+        raise ImportError("parquet export needs pyarrow (pip install hwapi[parquet])")
+
+    writer = None
+    batch = []
+    try:
+        async for item in items:
+            row = item if isinstance(item, dict) else item.to_dict()
+            if writer is None:
+                writer = WRITERS[format](path, columns or _columns(item, row), compress=compress, rotate_every=rotate_every)
+
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_batch(batch)
+                batch = []
+
+        if writer is None:
+            writer = WRITERS[format](path, columns or (), compress=compress, rotate_every=rotate_every)
+    finally:
+        # Rows read before an error are still written out.
+        if writer is not None:
+            try:
+                writer.write_batch(batch)
+            finally:
+                writer.close()
+
+    return {"rows": writer.rows, "files": writer.paths}
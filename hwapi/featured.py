@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+
+
+class FeaturedIndex:
+
+    def __init__(self, *, ttl=60 * 60):
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+        self._levels = {}
+        self._fetched_at = None
+        self._refresh_task = None
+
+    def __contains__(self, level):
+        if getattr(level, "id", level) in self._levels:
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __iter__(self):
+        return iter(self._levels.values())
+
+    def levels(self):
+        return list(self._levels.values())
+
+    @property
+    def populated(self):
+        return self._fetched_at is not None
+
+    @property
+    def stale(self):
+        if not self.populated:
+            return True
+
+        return self.ttl is not None and time.monotonic() - self._fetched_at > self.ttl
+
+    def update(self, levels):
+        self._levels = {level.id: level for level in levels}
+        self._fetched_at = time.monotonic()
+
+    def refresh(self, fetch):
+        # Starts fetch() in the background unless a refresh is already running, and
+        # returns the task. fetch() must return the featured levels.
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh(fetch))
+            self._refresh_task.add_done_callback(self._refresh_done)
+
+        return self._refresh_task
+
+    def cancel(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+
+    async def _refresh(self, fetch):
+        self.update(await fetch())
+        self.refreshes += 1
+
+    def _refresh_done(self, task):
+        # A failed background refresh keeps the old index; callers awaiting the task
+        # still see the exception.
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_failures += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._levels),
+            "stale": self.stale,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures
+        }
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import asyncio
+
+
+# How each ranking reads a replay's score (higher is better) and which listing order
+# returns replays best first.
+RANKINGS = {
+    "completion_time": (lambda replay: None if replay.completion_time is None else -replay.completion_time, "completion_time"),
+    "rating": (lambda replay: replay.weighted_rating, "rating")
+}
+
+
+class Leaderboard:
+
+    # The best k replays seen so far, in a min-heap keyed by score so the worst of them
+    # is at the root. Ties go to the lower replay id.
+
+    def __init__(self, k, by="completion_time"):
+        if k < 1:
+            raise ValueError("invalid parameter for k: {}".format(k))
+
+        if not by in RANKINGS:
+            raise ValueError("invalid parameter for by: {}".format(by))
+
+        self.k = k
+        self.by = by
+        self.sorted_by = RANKINGS[by][1]
+
+        self.replays_seen = 0
+        self.levels_scanned = 0
+        self.levels_cut_short = 0
+
+        self._score = RANKINGS[by][0]
+        self._heap = []
+
+    def offer(self, replay):
+        # Returns False if the replay can't enter the top k. Listings are sorted best
+        # first, so neither can the rest of its listing.
+        self.replays_seen += 1
+
+        score = self._score(replay)
+        if score is None:
+            return False
+
+        entry = (score, -replay.id, replay)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+
+        if entry[:2] <= self._heap[0][:2]:
+            return False
+
+        heapq.heapreplace(self._heap, entry)
+        return True
+
+    async def scan(self, client, level_id, priority="normal"):
+        self.levels_scanned += 1
+
+        listing = client.level_replays(level_id, self.sorted_by, priority=priority)
+        try:
+            async for replay in listing:
+                if not self.offer(replay):
+                    self.levels_cut_short += 1
+                    break
+        finally:
+            await listing.aclose()
+
+    def results(self):
+        return [replay for _, _, replay in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def stats(self):
+        return {
+            "replays_seen": self.replays_seen,
+            "levels_scanned": self.levels_scanned,
+            "levels_cut_short": self.levels_cut_short
+        }
+
+
+async def _level_ids(levels):
+    if hasattr(levels, "__aiter__"):
+        async for level in levels:
+            yield getattr(level, "id", level)
+    else:
+        for level in levels:
+            yield getattr(level, "id", level)
+
+
+async def top_replays(client, levels, k=10, by="completion_time", concurrency=8, leaderboard=None, priority="bulk"):
+    # Scans the replay listings of levels (Levels or ids, an iterable or async iterable)
+    # concurrently and returns the best k replays, best first. A level's listing is
+    # abandoned at the first replay that can't make the top k. Pass a Leaderboard to
+    # read its stats() afterwards; k and by are then taken from it.
+    if concurrency < 1:
+        raise ValueError("invalid parameter for concurrency: {}".format(concurrency))
+
+    board = leaderboard or Leaderboard(k, by)
+    level_ids = _level_ids(levels)
+    seen = set()
+    in_flight = set()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(in_flight) < concurrency:
+                try:
+                    level_id = await level_ids.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+
+                if not level_id in seen:
+                    seen.add(level_id)
+                    in_flight.add(asyncio.ensure_future(board.scan(client, level_id, priority)))
+
+            if not in_flight:
+                break
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        await level_ids.aclose()
+
+    return board.results()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+#
+# A local stand-in for totaljerkface.com, for benchmarks and offline development:
+#
+#   async with MockServer(levels=5000, latency=0.02) as server:
+#       client = hwapi.client(useragent="bench", base_url=server.url)
+#
+# or from a shell: python -m hwapi.mockserver --port 8080 --levels 5000
+
+import random
+import asyncio
+import argparse
+from xml.sax.saxutils import quoteattr, escape
+
+from aiohttp import web
+
+
+class MockServer:
+
+    def __init__(self, *, levels=1000, users=200, replays_per_level=45, featured=50, page_size=20,
+                 latency=0.0, jitter=0.0, error_rate=0.0, inactive_every=50, seed=0,
+                 host="127.0.0.1", port=0):
+        self.levels = levels
+        self.users = users
+        self.replays_per_level = replays_per_level
+        self.featured = featured
+        self.page_size = page_size
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.inactive_every = inactive_every
+
+        self.host = host
+        self.port = port
+
+        self.requests = 0
+        self.errors = 0
+
+        self._random = random.Random(seed)
+        self._runner = None
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(self.host, self.port)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def application(self):
+        app = web.Application()
+        app.router.add_post("/get_level.hw", self._get_level)
+        app.router.add_post("/replay.hw", self._replay)
+        app.router.add_get("/profile.tjf", self._profile)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        if self.port == 0:
+            self.port = self._runner.addresses[0][1]
+
+        return self.url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # Data, derived deterministically from ids.
+
+    def _author_id(self, level_id):
+        return level_id % self.users + 1
+
+    def _level_attrs(self, level_id):
+        author_id = self._author_id(level_id)
+        return {
+            "id": level_id,
+            "ln": "Level {}".format(level_id),
+            "dp": "20{:02d}-{:02d}-{:02d} 12:00:00".format(10 + level_id % 10, level_id % 12 + 1, level_id % 28 + 1),
+            "pc": level_id % 12,
+            "ps": level_id * 37 % 100000,
+            "vs": level_id * 13 % 500,
+            "rg": "{:.2f}".format(1 + level_id * 7 % 400 / 100),
+            "ui": author_id,
+            "un": "user{}".format(author_id)
+        }
+
+    def _level_xml(self, level_id):
+        return "<lv {}><uc>{}</uc></lv>".format(
+            " ".join("{}={}".format(k, quoteattr(str(v))) for k, v in self._level_attrs(level_id).items()),
+            escape("Description of level {}".format(level_id))
+        )
+
+    def _replay_attrs(self, level_id, index):
+        return {
+            "id": level_id * 1000 + index,
+            "dc": "2015-01-{:02d} 08:00:00".format(index % 28 + 1),
+            "vs": index % 30,
+            "rg": "{:.2f}".format(1 + (index * 3 + level_id) % 400 / 100),
+            "vw": index * 11,
+            "ct": 300 + (index * 17 + level_id * 131) % 3000,
+            "pc": index % 12,
+            "ui": index % self.users + 1,
+            "un": "user{}".format(index % self.users + 1)
+        }
+
+    def _replay_xml(self, level_id, index):
+        attrs = self._replay_attrs(level_id, index)
+        return "<rp {}><uc>Comment {}</uc></rp>".format(
+            " ".join("{}={}".format(k, quoteattr(str(v))) for k, v in attrs.items()),
+            attrs["id"]
+        )
+
+    def _sorted_level_ids(self, level_ids, sorted_by):
+        if sorted_by == "oldest":
+            return sorted(level_ids)
+        elif sorted_by == "plays":
+            return sorted(level_ids, key=lambda i: -self._level_attrs(i)["ps"])
+        elif sorted_by == "rating":
+            return sorted(level_ids, key=lambda i: -float(self._level_attrs(i)["rg"]))
+        else:
+            return sorted(level_ids, reverse=True)
+
+    def _sorted_replay_indices(self, level_id, sorted_by):
+        indices = range(self.replays_per_level)
+        if sorted_by == "newest":
+            return sorted(indices, reverse=True)
+        elif sorted_by == "rating":
+            return sorted(indices, key=lambda i: -float(self._replay_attrs(level_id, i)["rg"]))
+        elif sorted_by == "completion_time":
+            return sorted(indices, key=lambda i: self._replay_attrs(level_id, i)["ct"])
+        else:
+            return list(indices)
+
+    def _level_page(self, level_ids, page):
+        # Pages past the end repeat the last page, as the client's end detection expects.
+        if not level_ids:
+            return "<lvs></lvs>"
+
+        last_page = (len(level_ids) - 1) // self.page_size + 1
+        start = (min(page, last_page) - 1) * self.page_size
+        return "<lvs>" + "".join(self._level_xml(i) for i in level_ids[start:start + self.page_size]) + "</lvs>"
+
+    # Handlers.
+
+    async def _delay(self):
+        self.requests += 1
+
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            raise web.HTTPInternalServerError()
+
+    async def _form(self, request):
+        await self._delay()
+
+        try:
+            return await request.post()
+        except ConnectionResetError:
+            # The client gave up on the request, e.g. a cancelled prefetch.
+            return None
+
+    async def _get_level(self, request):
+        data = await self._form(request)
+        if data is None:
+            return web.Response(status=499)
+        action = data.get("action")
+
+        if action == "get_featured":
+            step = max(1, self.levels // max(1, self.featured))
+            ids = list(range(1, self.levels + 1, step))[:self.featured]
+            return web.Response(text="<lvs>" + "".join(self._level_xml(i) for i in ids) + "</lvs>")
+
+        if action == "get_level":
+            level_id = int(data["level_id"])
+            if not 1 <= level_id <= self.levels:
+                return web.Response(text="<lvs></lvs>")
+            return web.Response(text="<lvs>" + self._level_xml(level_id) + "</lvs>")
+
+        level_ids = range(1, self.levels + 1)
+        if action == "get_pub_by_user":
+            level_ids = [i for i in level_ids if self._author_id(i) == int(data["user_id"])]
+        elif action == "search_by_name":
+            term = data.get("sterm", "").lower()
+            level_ids = [i for i in level_ids if term in "level {}".format(i)]
+        elif action == "search_by_user":
+            term = data.get("sterm", "").lower()
+            level_ids = [i for i in level_ids if term in "user{}".format(self._author_id(i))]
+        elif action != "get_all":
+            raise web.HTTPBadRequest(text="unknown action {}".format(action))
+
+        level_ids = self._sorted_level_ids(list(level_ids), data.get("sortby", "newest"))
+        return web.Response(text=self._level_page(level_ids, int(data.get("page", 1))))
+
+    async def _replay(self, request):
+        data = await self._form(request)
+        if data is None:
+            return web.Response(status=499)
+        action = data.get("action")
+
+        if action == "get_combined":
+            replay_id = int(data["replay_id"])
+            level_id, index = divmod(replay_id, 1000)
+            return web.Response(text="<combined_data>{}{}</combined_data>".format(
+                self._replay_xml(level_id, index), self._level_xml(level_id)
+            ))
+
+        if action == "get_all_by_level":
+            level_id = int(data["level_id"])
+            page = int(data.get("page", 1))
+
+            indices = self._sorted_replay_indices(level_id, data.get("sortby"))
+
+            page_indices = indices[(page - 1) * self.page_size:page * self.page_size]
+            return web.Response(text="<rps>" + "".join(self._replay_xml(level_id, i) for i in page_indices) + "</rps>")
+
+        raise web.HTTPBadRequest(text="unknown action {}".format(action))
+
+    async def _profile(self, request):
+        await self._delay()
+        user_id = int(request.query["uid"])
+
+        if self.inactive_every and user_id % self.inactive_every == 0:
+            header = "This user's account is not active."
+            table = ""
+        else:
+            header = "user{}'s Profile".format(user_id)
+            table = (
+                '<table class="profile_table">'
+                "<tr><td>Date Joined:</td><td> 2010-01-{:02d} </td></tr>"
+                "<tr><td>Location:</td><td>Place {}</td></tr>"
+                "<tr><td>Gender:</td><td>unknown</td></tr>"
+                "</table>"
+            ).format(user_id % 28 + 1, user_id)
+
+        return web.Response(
+            text='<html><body><div class="header">{}</div>{}</body></html>'.format(escape(header), table),
+            content_type="text/html"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--levels", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server = MockServer(
+        levels=args.levels, users=args.users, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate
+    )
+    web.run_app(server.application(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,34 +3,122 @@
 from . import utils
 
 
+CHARACTER_NAMES = {
+    0: "Any",
+    1: "Wheelchair Guy",
+    2: "Segway Guy",
+    3: "Irresponsible Dad",
+    4: "Effective Shopper",
+    5: "Moped Couple",
+    6: "Lawnmower Man",
+    7: "Explorer Guy",
+    8: "Santa Claus",
+    9: "Pogostick Man",
+    10: "Irresponsible Mom",
+    11: "Helicopter Man"
+}
+
+LEVEL_FIELDS = ("@dp", "@id", "@ln", "@pc", "@ps", "@vs", "@rg", "uc", "@ui", "@un")
+REPLAY_FIELDS = ("@dc", "@id", "@vs", "@rg", "@vw", "@ct", "uc", "@pc", "@ui", "@un")
+
+
 def clean_string(s):
     return s.replace("\\", "")
 
 
+class _lazy:
+    # Computes an attribute with decode(obj) on first access and keeps the result in the
+    # "_<name>" slot. Assigning to the attribute overrides it.
+
+    def __init__(self, decode):
+        self.decode = decode
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            value = self.decode(obj)
+            setattr(obj, self.slot, value)
+            return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+def _raw_field(fields, name, convert):
+    index = fields.index(name)
+    return _lazy(lambda obj: convert(obj._raw[index]))
+
+
+def _optional_string(s):
+    return clean_string(s) if s else None
+
+
+def _completion_time(ct):
+    ct = int(ct)
+    return round(ct / 30, 2) if ct < 6000 else None
+
+
+def _author(fields):
+    id_index = fields.index("@ui")
+    name_index = fields.index("@un")
+
+    def decode(obj):
+        return User._shared(obj._state, int(obj._raw[id_index]), clean_string(obj._raw[name_index]))
+
+    return _lazy(decode)
+
+
+def _character(fields):
+    index = fields.index("@pc")
+    return _lazy(lambda obj: Character(character_id=int(obj._raw[index])))
+
+
+def _forget_decoded(obj):
+    for slot in obj._decoded:
+        if hasattr(obj, slot):
+            delattr(obj, slot)
+
+
+def _average_rating(obj):
+    return utils.average_rating(obj.weighted_rating, obj.votes)
+
+
 class Character:
 
+    __slots__ = ("id",)
+
+    _interned = {}
+
+    def __new__(cls, *, character_id):
+        character = cls._interned.get(character_id)
+        if character is None:
+            character = super().__new__(cls)
+            character.id = character_id
+            cls._interned[character_id] = character
+
+        return character
+
     def __init__(self, *, character_id):
-        self.id = character_id
+        pass
 
     def __str__(self):
-        return {
-            0: "Any",
-            1: "Wheelchair Guy",
-            2: "Segway Guy",
-            3: "Irresponsible Dad",
-            4: "Effective Shopper",
-            5: "Moped Couple",
-            6: "Lawnmower Man",
-            7: "Explorer Guy",
-            8: "Santa Claus",
-            9: "Pogostick Man",
-            10: "Irresponsible Mom",
-            11: "Helicopter Man"
-        }[self.id]
+        return CHARACTER_NAMES[self.id]
 
 
 class User:
 
+    __slots__ = (
+        "_complete", "_data", "_state", "active", "name", "id",
+        "_date_joined", "_email", "_website", "_location", "_gender", "__weakref__"
+    )
+
     def __init__(self, *, state, data):
         self._complete = False
         self._data = None
@@ -38,6 +126,20 @@ class User:
         self._state = state
         self._from_data(data)
 
+    @classmethod
+    def _shared(cls, state, user_id, name):
+        # Level and replay authors are shared per client through a weak identity map.
+        users = getattr(state, "_users", None)
+        if users is None:
+            return cls(state=state, data={"name": name, "id": user_id})
+
+        user = users.get(user_id)
+        if user is None:
+            user = cls(state=state, data={"name": name, "id": user_id})
+            users[user_id] = user
+
+        return user
+
     def _from_data(self, data):
         if not "active" in data:
             data["active"] = True
@@ -55,7 +157,7 @@ class User:
             self._gender = None
 
             if "profile_table" in data:
-                self._date_joined = data["profile_table"]["date joined"]
+                self._date_joined = data["profile_table"].get("date joined")
 
                 if "email" in data["profile_table"]:
                     self._email = data["profile_table"]["email"]
@@ -88,7 +190,14 @@ class User:
 
     async def _complete_data(self):
         user = await self._state.user(self.id)
-        self._from_data(user._data)
+        if user.active:
+            self._from_data(user._data)
+        else:
+            # Authors are shared by every level and replay of the user, so keep the id
+            # and name they were listed with instead of the inactive placeholder's.
+            user_id, name = self.id, self.name
+            self._from_data(user._data)
+            self.id, self.name = user_id, name
         self._complete = True
 
     async def date_joined(self):
@@ -138,38 +247,52 @@ class User:
     def levels(self, *args, **kwargs):
         return self._state.user_levels(self.id, *args, **kwargs)
 
+    def to_dict(self):
+        # Profile fields are None unless the profile has been fetched.
+        return {
+            "id": self.id,
+            "name": self.name,
+            "active": self.active,
+            "date_joined": self._date_joined,
+            "email": self._email,
+            "website": self._website,
+            "location": self._location,
+            "gender": self._gender
+        }
+
 
 class Level:
 
+    # Fields are kept as the raw attribute strings and decoded on first access.
+    _decoded = (
+        "_date_published", "_name", "_character", "_plays", "_votes",
+        "_weighted_rating", "_description", "_author", "_average_rating"
+    )
+    __slots__ = ("_state", "_raw", "id", "featured") + _decoded
+
+    date_published = _raw_field(LEVEL_FIELDS, "@dp", str)
+    name = _raw_field(LEVEL_FIELDS, "@ln", clean_string)
+    character = _character(LEVEL_FIELDS)
+    plays = _raw_field(LEVEL_FIELDS, "@ps", int)
+    votes = _raw_field(LEVEL_FIELDS, "@vs", int)
+    weighted_rating = _raw_field(LEVEL_FIELDS, "@rg", float)
+    description = _raw_field(LEVEL_FIELDS, "uc", _optional_string)
+    author = _author(LEVEL_FIELDS)
+    average_rating = _lazy(_average_rating)
+
     def __init__(self, *, state, data):
         self._state = state
         self._from_data(data)
 
     def _from_data(self, data):
-        self.date_published = data["@dp"]
-        self.id = int(data["@id"])
-        self.name = clean_string(data["@ln"])
-
-        character = int(data["@pc"])
-        self.character = Character(character_id=character)
-
-        self.plays = int(data["@ps"])
-        self.votes = int(data["@vs"])
-        self.weighted_rating = float(data["@rg"])
-
-        self.description = clean_string(data["uc"]) if data["uc"] else None
-
-        user_id = int(data["@ui"])
-        user_name = clean_string(data["@un"])
-        author = {"name": user_name, "id": user_id}
-        self.author = User(state=self._state, data=author)
+        _forget_decoded(self)
+        self._raw = tuple(data.get(field) for field in LEVEL_FIELDS)
+        self.id = int(self._raw[1])
 
         if "featured" in data:
             self.featured = True
         else:
-            self.featured = self in self._state._featured_cache
-
-        self._average_rating = None
+            self.featured = self.id in self._state._featured_cache
 
     def __eq__(self, other):
         if type(other) != type(self):
@@ -183,23 +306,49 @@ class Level:
     def __hash__(self):
         return hash(self.id)
 
-    @property
-    def average_rating(self):
-        if self._average_rating:
-            return self._average_rating
-        else:
-            self._average_rating = utils.average_rating(self.weighted_rating, self.votes)
-            return self._average_rating
-
     def replays(self, *args, **kwargs):
         return self._state.level_replays(self.id, *args, **kwargs)
 
+    def to_dict(self):
+        # Plain values only, e.g. for serialization.
+        return {
+            "id": self.id,
+            "name": self.name,
+            "author_id": self.author.id,
+            "author_name": self.author.name,
+            "character": self.character.id,
+            "plays": self.plays,
+            "votes": self.votes,
+            "weighted_rating": self.weighted_rating,
+            "average_rating": self.average_rating,
+            "description": self.description,
+            "date_published": self.date_published,
+            "featured": self.featured
+        }
+
 
 class Replay:
 
-    def __init__(self, *, state, data):
+    _decoded = (
+        "_date_created", "_votes", "_weighted_rating", "_views", "_completion_time",
+        "_comment", "_character", "_author", "_average_rating"
+    )
+    __slots__ = ("_state", "_raw", "id", "level_id", "_complete", "_data", "_level") + _decoded
+
+    date_created = _raw_field(REPLAY_FIELDS, "@dc", str)
+    votes = _raw_field(REPLAY_FIELDS, "@vs", int)
+    weighted_rating = _raw_field(REPLAY_FIELDS, "@rg", float)
+    views = _raw_field(REPLAY_FIELDS, "@vw", int)
+    completion_time = _raw_field(REPLAY_FIELDS, "@ct", _completion_time)
+    comment = _raw_field(REPLAY_FIELDS, "uc", _optional_string)
+    character = _character(REPLAY_FIELDS)
+    author = _author(REPLAY_FIELDS)
+    average_rating = _lazy(_average_rating)
+
+    def __init__(self, *, state, data, level_id=None):
         self._complete = False
         self._data = None
+        self.level_id = level_id
 
         self._state = state
         self._from_data(data)
@@ -216,51 +365,57 @@ class Replay:
                 state=self._state,
                 data=data["lv"]
             )
+            self.level_id = self._level.id
             self._complete = True
             self._data = data
         else:
             self._level = None
             self._complete = False
 
-        self.date_created = data["rp"]["@dc"]
-        self.id = int(data["rp"]["@id"])
-        self.votes = int(data["rp"]["@vs"])
-        self.weighted_rating = float(data["rp"]["@rg"])
-        self.views = int(data["rp"]["@vw"])
-
-        if int(data["rp"]["@ct"]) < 6000:
-            self.completion_time = round(int(data["rp"]["@ct"]) / 30, 2)
-        else:
-            self.completion_time = None
-
-        self.comment = clean_string(data["rp"]["uc"]) if data["rp"]["uc"] else None
-
-        character = int(data["rp"]["@pc"])
-        self.character = Character(character_id=character)
-
-        user_id = int(data["rp"]["@ui"])
-        user_name = clean_string(data["rp"]["@un"])
-        author = {"name": user_name, "id": user_id}
-        self.author = User(state=self._state, data=author)
-
-        self._average_rating = None
+        _forget_decoded(self)
+        self._raw = tuple(data["rp"].get(field) for field in REPLAY_FIELDS)
+        self.id = int(self._raw[1])
 
     async def _complete_data(self):
-        replay = await self._state.replay(self.id)
-        self._from_data(user._data)
+        replay = await self._state.replay(self.id, fetch=True)
+        self._from_data(replay._data)
         self._complete = True
 
-    @property
-    def average_rating(self):
-        if self._average_rating:
-            return self._average_rating
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
         else:
-            self._average_rating = utils.average_rating(self.weighted_rating, self.votes)
-            return self._average_rating
+            return self.id == other.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.id)
 
     async def level(self):
         if (self._level != None or self._complete):
             return self._level
+        elif self.level_id is not None:
+            self._level = await self._state.level(self.level_id)
+            return self._level
         else:
             await self._complete_data()
             return self._level
+
+    def to_dict(self):
+        # level_id is None for replays fetched by id alone whose level isn't known yet.
+        return {
+            "id": self.id,
+            "level_id": self.level_id,
+            "author_id": self.author.id,
+            "author_name": self.author.name,
+            "character": self.character.id,
+            "votes": self.votes,
+            "weighted_rating": self.weighted_rating,
+            "average_rating": self.average_rating,
+            "views": self.views,
+            "completion_time": self.completion_time,
+            "comment": self.comment,
+            "date_created": self.date_created
+        }
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+from .prefetch import PagePrefetcher
+
+
+# End-of-listing detection shared by Paginator, sync.sync and crawl.crawl.
+
+def past_end(ids, previous_ids):
+    # An empty page, or one whose ids all appeared on the previous page: past the end
+    # the server repeats the last page.
+    return not ids or ids <= previous_ids
+
+
+def is_last(size, page_size):
+    # A page shorter than the page size is the last. Until the page size is known, so is
+    # a page with a single item.
+    return size < page_size if page_size else size == 1
+
+
+def learn_page_size(page_sizes, key, size):
+    # Records a full page's size for listings of this kind; returns the page size.
+    page_size = max(size, page_sizes.get(key) or 0)
+    page_sizes[key] = page_size
+    return page_size
+
+
+class Cursor:
+
+    # Position in a paginated listing: the endpoint and payload without the page number,
+    # the next page to fetch and how many of its items were already consumed. to_dict()
+    # gives a JSON-serializable form that from_dict() and client.resume() accept.
+
+    def __init__(self, endpoint, params, page=1, *, offset=0, page_size=None, done=False):
+        self.endpoint = endpoint
+        self.params = dict(params)
+        self.page = page
+        self.offset = offset
+        self.page_size = page_size
+        self.done = done
+
+    def payload(self, page):
+        payload = dict(self.params)
+        payload["page"] = page
+        return payload
+
+    @property
+    def key(self):
+        return (self.endpoint, self.params.get("action"))
+
+    def to_dict(self):
+        return {
+            "endpoint": self.endpoint,
+            "params": dict(self.params),
+            "page": self.page,
+            "offset": self.offset,
+            "page_size": self.page_size,
+            "done": self.done
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["endpoint"],
+            data["params"],
+            data["page"],
+            offset=data.get("offset", 0),
+            page_size=data.get("page_size"),
+            done=data.get("done", False)
+        )
+
+    def __repr__(self):
+        return "<Cursor {} {} page={} offset={}{}>".format(
+            self.endpoint, self.params, self.page, self.offset, " done" if self.done else ""
+        )
+
+
+class Paginator:
+
+    # Iterates the items of a listing and keeps self.cursor up to date.
+    #
+    # The listing ends at a page shorter than the page size, at an empty page, or at a
+    # page whose ids all appeared on the previous one (past the end the server repeats
+    # the last page). The page size is learned from full pages and shared through
+    # page_sizes, so later listings of the same kind end on their last page without
+    # fetching another. Until it is known, a page with a single item is taken as the last.
+    # Items that newer uploads pushed over from the previous page are skipped.
+
+    def __init__(self, cursor, fetch_page, parse_page, *, prefetch=0, single=False, page_sizes=None):
+        self.cursor = cursor
+        self.prefetch = prefetch
+        self.single = single
+
+        self._fetch_page = fetch_page
+        self._parse_page = parse_page
+        self._page_sizes = page_sizes if page_sizes is not None else {}
+        self._iterator = None
+
+    def __aiter__(self):
+        if self._iterator is None:
+            self._iterator = self._iterate()
+
+        return self._iterator
+
+    def __anext__(self):
+        return self.__aiter__().__anext__()
+
+    async def aclose(self):
+        if self._iterator is not None:
+            await self._iterator.aclose()
+
+    def _page_size(self):
+        return self.cursor.page_size or self._page_sizes.get(self.cursor.key)
+
+    def _learn_page_size(self, size):
+        size = max(size, self.cursor.page_size or 0)
+        self.cursor.page_size = learn_page_size(self._page_sizes, self.cursor.key, size)
+
+    async def _iterate(self):
+        cursor = self.cursor
+        if cursor.done:
+            return
+
+        pages = PagePrefetcher(self._fetch_page, cursor.page, prefetch=self.prefetch, single=self.single)
+        previous_ids = frozenset()
+        previous_size = 0
+        try:
+            async for raw_metadata in pages:
+                items = await self._parse_page(raw_metadata)
+                if items is None:
+                    return
+
+                ids = frozenset(item.id for item in items)
+                if past_end(ids, previous_ids):
+                    cursor.done = True
+                    return
+
+                if previous_ids:
+                    # The previous page wasn't the last one, so it was full.
+                    self._learn_page_size(previous_size)
+
+                page_size = self._page_size()
+                if page_size is not None and len(items) > page_size:
+                    self._learn_page_size(len(items))
+                    page_size = len(items)
+
+                last = is_last(len(items), page_size)
+
+                for index in range(cursor.offset, len(items)):
+                    cursor.offset = index + 1
+                    if not items[index].id in previous_ids:
+                        yield items[index]
+
+                cursor.page += 1
+                cursor.offset = 0
+                if last:
+                    cursor.done = True
+                    return
+
+                previous_ids = ids
+                previous_size = len(items)
+        finally:
+            pages.close()
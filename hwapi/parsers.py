@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+from xml.parsers import expat
+
+import xmltodict
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+
+class ListingParser:
+    # Incremental expat parser for <lvs><lv .../></lvs> and <rps><rp .../></rps> documents.
+    # Each item is returned as a dict shaped like xmltodict's output for it: attributes
+    # prefixed with "@", and the text of each child element keyed by its tag.
+
+    def __init__(self, item_tag):
+        self.item_tag = item_tag
+
+        self._depth = 0
+        self._item = None
+        self._child = None
+        self._text = []
+        self._ready = []
+
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+
+    def _start(self, tag, attrs):
+        self._depth += 1
+
+        if self._depth == 2 and tag == self.item_tag:
+            self._item = {"@" + key: value for key, value in attrs.items()}
+        elif self._depth == 3 and self._item is not None:
+            self._child = tag
+            self._text = []
+
+    def _end(self, tag):
+        if self._depth == 3 and self._child is not None:
+            text = "".join(self._text).strip()
+            self._item[self._child] = text or None
+            self._child = None
+        elif self._depth == 2 and self._item is not None:
+            self._ready.append(self._item)
+            self._item = None
+
+        self._depth -= 1
+
+    def _data(self, data):
+        if self._child is not None:
+            self._text.append(data)
+
+    def feed(self, data, final=False):
+        # Returns the items completed by this chunk. Raises expat.ExpatError on bad input.
+        self._parser.Parse(data, final)
+
+        ready, self._ready = self._ready, []
+        return ready
+
+    def close(self):
+        return self.feed("", True)
+
+
+def iter_items(item_tag, text, chunk_size=64 * 1024):
+    parser = ListingParser(item_tag)
+
+    for start in range(0, len(text), chunk_size):
+        for item in parser.feed(text[start:start + chunk_size]):
+            yield item
+
+    for item in parser.close():
+        yield item
+
+
+def iter_levels(text, chunk_size=64 * 1024):
+    return iter_items("lv", text, chunk_size)
+
+
+def iter_replays(text, chunk_size=64 * 1024):
+    return iter_items("rp", text, chunk_size)
+
+
+INACTIVE_PROFILE_HEADER = "This user's account is not active."
+
+
+def _profile_data(user_id, header, rows):
+    # rows is a list of (label, value) pairs from the profile table.
+    if header == INACTIVE_PROFILE_HEADER:
+        return {"active": False}
+
+    return {
+        "active": True,
+        "profile_table": {label.replace(":", "").lower(): value.strip() for label, value in rows},
+        "name": header.split("'s Profile")[0],
+        "id": user_id
+    }
+
+
+if lxml is not None:
+    _find_header = lxml.etree.XPath(
+        "(//div[contains(concat(' ', normalize-space(@class), ' '), ' header ')])[1]"
+    )
+    _find_profile_rows = lxml.etree.XPath(
+        "(//table[contains(concat(' ', normalize-space(@class), ' '), ' profile_table ')])[1]//tr"
+    )
+    _find_cells = lxml.etree.XPath(".//td")
+
+
+def parse_profile_lxml(html, user_id):
+    # Reads only the header div and profile table rows. Returns None if lxml is missing
+    # or the page doesn't look like a profile, so the caller can fall back.
+    if lxml is None:
+        return None
+
+    try:
+        document = lxml.html.fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        return None
+
+    header = _find_header(document)
+    if not header:
+        return None
+
+    header = header[0].text_content()
+    if header == INACTIVE_PROFILE_HEADER:
+        return _profile_data(user_id, header, [])
+
+    rows = _find_profile_rows(document)
+    if not rows:
+        return None
+
+    pairs = []
+    for row in rows:
+        cells = _find_cells(row)
+        if len(cells) < 2:
+            return None
+        pairs.append((cells[0].text_content(), cells[1].text_content()))
+
+    return _profile_data(user_id, header, pairs)
+
+
+def parse_profile_soup(html, user_id):
+    soup = BeautifulSoup(html, "lxml")
+    header = soup.find("div", class_="header").text
+
+    if header == INACTIVE_PROFILE_HEADER:
+        return _profile_data(user_id, header, [])
+
+    pairs = []
+    for row in soup.find("table", class_="profile_table").find_all("tr"):
+        columns = row.find_all("td")
+        pairs.append((columns[0].text, columns[1].text))
+
+    return _profile_data(user_id, header, pairs)
+
+
+def parse_profile(html, user_id):
+    user_data = parse_profile_lxml(html, user_id)
+    if user_data is None:
+        user_data = parse_profile_soup(html, user_id)
+
+    return user_data
+
+
+# Plain-data entry points for the parse executor. They are module level and return
+# dicts and lists only, so they can run in another process.
+
+def parse_levels(text):
+    return list(iter_levels(text))
+
+
+def parse_replays(text):
+    return list(iter_replays(text))
+
+
+def parse_level(text):
+    return xmltodict.parse(text)["lvs"]["lv"]
+
+
+def parse_replay(text):
+    return xmltodict.parse(text)["combined_data"]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+
+
+class PagePrefetcher:
+
+    def __init__(self, fetch_page, page=1, *, prefetch=0, single=False):
+        if prefetch < 0:
+            raise ValueError("invalid parameter for prefetch: {}".format(prefetch))
+
+        self.prefetch = prefetch
+        self.single = single
+
+        self._fetch_page = fetch_page
+        self._start_page = page
+        self._next_page = page
+        self._pending = collections.deque()
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed or (self.single and self._next_page > self._start_page):
+            raise StopAsyncIteration
+
+        if self.prefetch == 0 or self.single:
+            page = self._next_page
+            self._next_page += 1
+            return await self._fetch_page(page)
+
+        # Keep the current page plus up to `prefetch` pages in flight. Requests still go
+        # through the client's rate limiter, so read-ahead never exceeds its budget.
+        while len(self._pending) < self.prefetch + 1:
+            self._pending.append(asyncio.ensure_future(self._fetch_page(self._next_page)))
+            self._next_page += 1
+
+        task = self._pending.popleft()
+        try:
+            return await task
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._closed = True
+
+        while self._pending:
+            task = self._pending.popleft()
+            if task.done():
+                if not task.cancelled():
+                    task.exception()
+            else:
+                task.cancel()
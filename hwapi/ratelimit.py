@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import collections
+import multiprocessing
+
+
+# Priority classes and their default shares of a contended budget.
+PRIORITIES = {"interactive": 8, "normal": 4, "bulk": 1}
+
+
+class FairQueue:
+
+    # Admits up to `capacity` holders at a time. Waiters are served across priority
+    # classes by start-time fair queueing: a class's next turn is tagged with a virtual
+    # time that advances by 1/share per grant, and the smallest tag goes first. Backlogged
+    # classes therefore split the grants in proportion to their shares, and a class that
+    # was idle starts at the current virtual time, so it goes almost straight to the front
+    # but can't bank turns. Within a class, waiters are served in FIFO order.
+
+    def __init__(self, capacity=1, shares=None):
+        self.capacity = capacity
+        self.shares = dict(shares or PRIORITIES)
+
+        self._holders = 0
+        self._waiters = {name: collections.deque() for name in self.shares}
+        self._tags = {name: 0.0 for name in self.shares}
+        self._virtual_time = 0.0
+
+    def _check(self, priority):
+        if not priority in self.shares:
+            raise ValueError("invalid parameter for priority: {}".format(priority))
+
+    def _start_tag(self, priority):
+        return max(self._tags[priority], self._virtual_time)
+
+    def _grant(self, priority):
+        self._virtual_time = self._start_tag(priority)
+        self._tags[priority] = self._virtual_time + 1 / self.shares[priority]
+        self._holders += 1
+
+    async def acquire(self, priority="normal"):
+        self._check(priority)
+
+        if self._holders < self.capacity and not any(self._waiters.values()):
+            self._grant(priority)
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        self._waiters[priority].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the waiter was cancelled; hand the slot on.
+                self.release()
+            elif future in self._waiters[priority]:
+                # release() drops cancelled waiters it comes across, so it may be gone already.
+                self._waiters[priority].remove(future)
+            raise
+
+    def release(self):
+        self._holders -= 1
+
+        while self._holders < self.capacity:
+            candidates = [
+                (self._start_tag(name), -self.shares[name], name)
+                for name, waiters in self._waiters.items() if waiters
+            ]
+            if not candidates:
+                return
+
+            name = min(candidates)[2]
+            future = self._waiters[name].popleft()
+            if not future.done():
+                self._grant(name)
+                future.set_result(None)
+
+    def waiting(self):
+        return {name: len(waiters) for name, waiters in self._waiters.items()}
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst=1, shares=None):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive or None, got {}".format(rate))
+
+        if burst < 1:
+            raise ValueError("burst must be at least 1, got {}".format(burst))
+
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._queue = FairQueue(1, shares)
+
+    def set_rate(self, rate):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive or None, got {}".format(rate))
+
+        # Tokens accrued so far count at the old rate.
+        if self.rate is not None:
+            self._refill()
+        else:
+            self._updated = time.monotonic()
+
+        self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority="normal"):
+        # Returns the number of seconds spent waiting for a token.
+        if self.rate is None:
+            return 0
+
+        # One waiter at a time waits for the next token; the queue decides whose turn it is.
+        await self._queue.acquire(priority)
+        try:
+            self._refill()
+
+            waited = 0
+            if self._tokens < 1:
+                waited = (1 - self._tokens) / self.rate
+                await asyncio.sleep(waited)
+                self._refill()
+
+            self._tokens -= 1
+            return waited
+        finally:
+            self._queue.release()
+
+
+class SharedTokenBucket:
+
+    # A token bucket in shared memory, so several processes can draw from one request
+    # budget. acquire() reserves a token under a process-shared lock (the balance may go
+    # negative) and then sleeps until the token is due, so the lock is never held while
+    # waiting. Create it before starting the processes and pass it to them. Priorities
+    # order the waiters within each process.
+
+    def __init__(self, rate, burst=1, *, context=None, shares=None):
+        if rate is None or rate <= 0:
+            raise ValueError("rate must be positive, got {}".format(rate))
+
+        if burst < 1:
+            raise ValueError("burst must be at least 1, got {}".format(burst))
+
+        context = context or multiprocessing.get_context()
+        self._lock = context.Lock()
+        # rate, burst, tokens, updated
+        self._state = context.RawArray("d", [rate, burst, burst, time.monotonic()])
+        self._queue = FairQueue(1, shares)
+
+    @property
+    def rate(self):
+        return self._state[0]
+
+    @property
+    def burst(self):
+        return self._state[1]
+
+    def set_rate(self, rate):
+        if rate is None or rate <= 0:
+            raise ValueError("rate must be positive, got {}".format(rate))
+
+        with self._lock:
+            self._refill()
+            self._state[0] = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        rate, burst, tokens, updated = self._state
+        self._state[2] = min(burst, tokens + (now - updated) * rate)
+        self._state[3] = now
+
+    async def acquire(self, priority="normal"):
+        await self._queue.acquire(priority)
+        try:
+            with self._lock:
+                self._refill()
+                self._state[2] -= 1
+                tokens = self._state[2]
+                rate = self._state[0]
+
+            waited = 0
+            if tokens < 0:
+                waited = -tokens / rate
+                await asyncio.sleep(waited)
+
+            return waited
+        finally:
+            self._queue.release()
+
+
+class RateLimiter:
+
+    def __init__(self, *, rate, burst=1, max_in_flight=None, endpoint_rates=None, bucket=None, shares=None):
+        # bucket replaces the global TokenBucket built from rate and burst. shares maps
+        # priority classes to their weights (default PRIORITIES).
+        self.max_in_flight = max_in_flight
+        self.shares = dict(shares or PRIORITIES)
+
+        self._bucket = bucket if bucket is not None else TokenBucket(rate, burst, self.shares)
+        self._endpoint_buckets = {}
+        for endpoint, endpoint_rate in (endpoint_rates or {}).items():
+            if isinstance(endpoint_rate, (tuple, list)):
+                self._endpoint_buckets[endpoint] = TokenBucket(*endpoint_rate, shares=self.shares)
+            else:
+                self._endpoint_buckets[endpoint] = TokenBucket(endpoint_rate, shares=self.shares)
+
+        self._in_flight = FairQueue(max_in_flight, self.shares) if max_in_flight is not None else None
+
+        self.granted = collections.Counter()
+        self.waited = collections.defaultdict(float)
+
+    @property
+    def rate(self):
+        return self._bucket.rate
+
+    def set_rate(self, rate):
+        self._bucket.set_rate(rate)
+
+    def limit(self, endpoint, priority="normal"):
+        if not priority in self.shares:
+            raise ValueError("invalid parameter for priority: {}".format(priority))
+
+        return _Permit(self, endpoint, priority)
+
+    async def _acquire(self, endpoint, priority):
+        # The in-flight slot comes first: a request holding a token while it waits for a
+        # slot would go out together with others once slots free up, exceeding the burst.
+        waited = 0
+        if self._in_flight is not None:
+            start = time.monotonic()
+            await self._in_flight.acquire(priority)
+            waited += time.monotonic() - start
+
+        try:
+            if endpoint in self._endpoint_buckets:
+                waited += await self._endpoint_buckets[endpoint].acquire(priority)
+
+            waited += await self._bucket.acquire(priority)
+        except BaseException:
+            self._release()
+            raise
+
+        self.granted[priority] += 1
+        self.waited[priority] += waited
+        return waited
+
+    def _release(self):
+        if self._in_flight is not None:
+            self._in_flight.release()
+
+    def stats(self):
+        return {
+            priority: {"requests": self.granted[priority], "rate_limit_wait": self.waited[priority]}
+            for priority in self.shares
+        }
+
+
+class _Permit:
+
+    def __init__(self, limiter, endpoint, priority):
+        self._limiter = limiter
+        self._endpoint = endpoint
+        self._priority = priority
+        self.waited = 0
+
+    async def __aenter__(self):
+        self.waited = await self._limiter._acquire(self._endpoint, self._priority)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._limiter._release()
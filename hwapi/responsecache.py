@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import sqlite3
+import hashlib
+
+from . import errors
+
+
+DEFAULT_TTLS = {
+    "featured": 60 * 60,
+    "level": 24 * 60 * 60,
+    "listing": 10 * 60,
+    "replay": 24 * 60 * 60,
+    "replay_listing": 10 * 60,
+    "profile": 60 * 60
+}
+
+
+def response_kind(url, payload=None):
+    endpoint = url.split("?")[0].rsplit("/", 1)[-1]
+    action = (payload or {}).get("action")
+
+    if endpoint == "profile.tjf":
+        return "profile"
+    elif endpoint == "replay.hw":
+        return "replay" if action == "get_combined" else "replay_listing"
+    elif action == "get_featured":
+        return "featured"
+    elif action == "get_level":
+        return "level"
+    else:
+        return "listing"
+
+
+class ResponseCache:
+
+    def __init__(self, path, *, ttls=None, max_entries=100000, offline=False):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_entries = max_entries
+        self.offline = offline
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, body TEXT NOT NULL, "
+            "stored REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def _key(url, payload):
+        raw = json.dumps([url, sorted((str(k), str(v)) for k, v in (payload or {}).items())])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, url, payload=None):
+        # Returns the cached body or None. Offline, stale entries are served and
+        # misses raise OfflineCacheMiss instead.
+        key = self._key(url, payload)
+        row = self._db.execute("SELECT body, stored FROM responses WHERE key = ?", (key,)).fetchone()
+
+        ttl = self.ttls.get(response_kind(url, payload))
+        if row is not None and (self.offline or (ttl and time.time() - row[1] < ttl)):
+            self.hits += 1
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+        self.misses += 1
+        if self.offline:
+            raise errors.OfflineCacheMiss(url, payload)
+
+        return None
+
+    def set(self, url, payload, body):
+        kind = response_kind(url, payload)
+        if not self.ttls.get(kind):
+            return
+
+        now = time.time()
+        key = self._key(url, payload)
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO responses (key, kind, body, stored, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, kind, body, now, now)
+        )
+        if cursor.rowcount:
+            self._count += 1
+        else:
+            self._db.execute(
+                "UPDATE responses SET body = ?, stored = ?, accessed = ? WHERE key = ?",
+                (body, now, now, key)
+            )
+
+        if self._count > self.max_entries:
+            self._evict(self._count - self.max_entries)
+
+        self._db.commit()
+
+    def _evict(self, n):
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+            (n,)
+        )
+        self._count -= n
+        self.evictions += n
+
+    def purge_expired(self):
+        now = time.time()
+        for kind, ttl in self.ttls.items():
+            if ttl:
+                self._db.execute("DELETE FROM responses WHERE kind = ? AND stored < ?", (kind, now - ttl))
+
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        self._db.execute("DELETE FROM responses")
+        self._db.commit()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self._count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None
+        }
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import sqlite3
+
+from . import models
+
+
+FIELDS = {"name": 0, "author": 1, "description": 2}
+
+ORDERS = {
+    "newest": "id DESC",
+    "oldest": "id ASC",
+    "plays": "plays DESC, id DESC",
+    "rating": "weighted_rating DESC, id DESC"
+}
+
+_RAW_INDEX = {field: index for index, field in enumerate(models.LEVEL_FIELDS)}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Sorts after every other character, so [prefix, prefix + _MAX_CHAR) covers all terms
+# starting with prefix.
+_MAX_CHAR = "\U0010ffff"
+
+
+def tokenize(s):
+    return _TOKEN.findall(models.clean_string(s).lower()) if s else []
+
+
+class LevelIndex:
+
+    # Inverted index over level names, author names and descriptions, kept in SQLite.
+    # Each query word matches any indexed word it is a prefix of; all words must match.
+    # Levels come back as models.Level bound to `client`.
+
+    def __init__(self, path, *, client):
+        self.path = path
+        self._state = client
+
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS levels ("
+            "id INTEGER PRIMARY KEY, data TEXT NOT NULL, plays INTEGER NOT NULL, "
+            "weighted_rating REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS terms ("
+            "term TEXT NOT NULL, field INTEGER NOT NULL, level_id INTEGER NOT NULL, "
+            "PRIMARY KEY (term, field, level_id)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS terms_level ON terms (level_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS levels_plays ON levels (plays)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS levels_rating ON levels (weighted_rating)")
+        self._db.commit()
+
+    def add(self, levels):
+        # Inserts or replaces levels; returns how many were indexed.
+        rows = []
+        terms = []
+        for level in levels:
+            raw = level._raw
+            data = dict(zip(models.LEVEL_FIELDS, raw))
+            rows.append((level.id, json.dumps(data), int(raw[_RAW_INDEX["@ps"]]), float(raw[_RAW_INDEX["@rg"]])))
+
+            for field, raw_field in (("name", "@ln"), ("author", "@un"), ("description", "uc")):
+                for term in set(tokenize(raw[_RAW_INDEX[raw_field]])):
+                    terms.append((term, FIELDS[field], level.id))
+
+        with self._db:
+            self._db.executemany("DELETE FROM terms WHERE level_id = ?", ((row[0],) for row in rows))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO levels (id, data, plays, weighted_rating) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._db.executemany("INSERT OR IGNORE INTO terms (term, field, level_id) VALUES (?, ?, ?)", terms)
+
+        return len(rows)
+
+    async def update(self, levels, batch_size=500):
+        # Indexes an async iterable of levels, e.g. client.sync_levels(checkpoint),
+        # committing every batch_size levels. Returns how many were indexed.
+        count = 0
+        batch = []
+        async for level in levels:
+            batch.append(level)
+            if len(batch) >= batch_size:
+                count += self.add(batch)
+                batch = []
+
+        return count + self.add(batch)
+
+    def remove(self, level_ids):
+        level_ids = [(level_id,) for level_id in level_ids]
+        with self._db:
+            self._db.executemany("DELETE FROM terms WHERE level_id = ?", level_ids)
+            self._db.executemany("DELETE FROM levels WHERE id = ?", level_ids)
+
+    def search(self, term, sorted_by="newest", fields=("name", "author", "description"), limit=None, offset=0):
+        if not sorted_by in ORDERS:
+            raise ValueError("invalid parameter for sorted_by: {}".format(sorted_by))
+
+        for field in fields:
+            if not field in FIELDS:
+                raise ValueError("invalid search field: {}".format(field))
+
+        words = tokenize(term)
+        if not words or not fields:
+            return []
+
+        field_ids = ", ".join(str(FIELDS[field]) for field in fields)
+        matches = " INTERSECT ".join(
+            "SELECT level_id FROM terms WHERE term >= ? AND term < ? AND field IN ({})".format(field_ids)
+            for _ in words
+        )
+        params = []
+        for word in words:
+            params += [word, word + _MAX_CHAR]
+
+        query = "SELECT data FROM levels WHERE id IN ({}) ORDER BY {}".format(matches, ORDERS[sorted_by])
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+
+        return [models.Level(state=self._state, data=json.loads(row[0])) for row in self._db.execute(query, params)]
+
+    def search_by_level(self, term, sorted_by="newest", **kwargs):
+        return self.search(term, sorted_by, fields=("name",), **kwargs)
+
+    def search_by_author(self, term, sorted_by="newest", **kwargs):
+        return self.search(term, sorted_by, fields=("author",), **kwargs)
+
+    def get(self, level_id):
+        row = self._db.execute("SELECT data FROM levels WHERE id = ?", (level_id,)).fetchone()
+        return None if row is None else models.Level(state=self._state, data=json.loads(row[0]))
+
+    def __contains__(self, level):
+        level_id = getattr(level, "id", level)
+        return self._db.execute("SELECT 1 FROM levels WHERE id = ?", (level_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM levels").fetchone()[0]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import asyncio
+import itertools
+import traceback
+import collections
+import multiprocessing
+
+from . import errors
+from . import ratelimit
+from .client import client
+
+
+def _pages(pages, shard, shards):
+    # pages is None (every page) or a list; shards take every shards-th page.
+    if pages is None:
+        return itertools.count(shard + 1, shards)
+
+    return pages[shard::shards]
+
+
+async def _crawl(kind, work, params, client_kwargs, bucket, results, shard, batch_size):
+    async with client(token_bucket=bucket, **client_kwargs) as api:
+        if kind == "levels":
+            pages = _pages(work, shard, params["shards"])
+            items = api.crawl_levels(params["sorted_by"], params["uploaded"], pages=pages, concurrency=params["concurrency"])
+        elif kind == "level_replays":
+            items = api.crawl_level_replays(work, params["sorted_by"], pages=params["pages"], concurrency=params["concurrency"])
+        else:
+            items = _user_rows(api.iter_users(work, params["concurrency"]))
+
+        batch = []
+        async for item in items:
+            batch.append(item if isinstance(item, dict) else item.to_dict())
+            if len(batch) >= batch_size:
+                results.put(("items", shard, batch))
+                batch = []
+
+        if batch:
+            results.put(("items", shard, batch))
+
+
+async def _user_rows(users):
+    # Inactive users come back with id 0; report them under the requested id.
+    async for user_id, user in users:
+        row = user.to_dict()
+        row["id"] = user_id
+        yield row
+
+
+def _worker(kind, work, params, client_kwargs, bucket, results, shard, batch_size):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(_crawl(kind, work, params, client_kwargs, bucket, results, shard, batch_size))
+        results.put(("done", shard, None))
+    except BaseException:
+        results.put(("error", shard, traceback.format_exc()))
+    finally:
+        loop.close()
+
+
+def _get(results, timeout):
+    try:
+        return results.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+class _RecentIds:
+
+    # The last `size` distinct ids added; older ones are forgotten.
+
+    def __init__(self, size):
+        self.size = size
+        self._ids = collections.OrderedDict()
+
+    def add(self, item_id):
+        # Returns False if item_id was added recently.
+        if item_id in self._ids:
+            self._ids.move_to_end(item_id)
+            return False
+
+        self._ids[item_id] = None
+        if len(self._ids) > self.size:
+            self._ids.popitem(last=False)
+        return True
+
+
+class ShardedCrawler:
+
+    # Runs a crawl in `workers` processes, each with its own client, all drawing from one
+    # SharedTokenBucket of `rate` requests/s. Results are yielded as plain dicts (see
+    # Level.to_dict, Replay.to_dict, User.to_dict) in arrival order, deduplicated by id
+    # against the last `dedupe_window` rows so memory stays bounded on long crawls.
+    # Other keyword arguments are passed to each worker's client.
+
+    def __init__(self, *, useragent, rate, burst=1, workers=None, batch_size=100, dedupe_window=50000, **client_kwargs):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.dedupe_window = dedupe_window
+
+        self._context = multiprocessing.get_context("spawn")
+        self._bucket = ratelimit.SharedTokenBucket(
+            rate, burst, context=self._context, shares=client_kwargs.get("priority_shares")
+        )
+        self._client_kwargs = dict(client_kwargs, useragent=useragent)
+
+    def levels(self, sorted_by, uploaded, pages=None, concurrency=4):
+        # Worker i fetches pages i + 1, i + 1 + workers, ... of the listing.
+        pages = list(pages) if pages is not None else None
+        params = {"sorted_by": sorted_by, "uploaded": uploaded, "concurrency": concurrency, "shards": self.workers}
+        return self._run("levels", [pages] * self.workers, params)
+
+    def level_replays(self, level_ids, sorted_by, pages=None, concurrency=4):
+        level_ids = list(dict.fromkeys(level_ids))
+        params = {"sorted_by": sorted_by, "pages": list(pages) if pages is not None else None, "concurrency": concurrency}
+        return self._run("level_replays", self._split(level_ids), params)
+
+    def users(self, user_ids, concurrency=8):
+        user_ids = list(dict.fromkeys(user_ids))
+        return self._run("users", self._split(user_ids), {"concurrency": concurrency})
+
+    def _split(self, ids):
+        return [ids[shard::self.workers] for shard in range(self.workers) if ids[shard::self.workers]]
+
+    async def _run(self, kind, shards, params):
+        results = self._context.Queue()
+        processes = []
+        for shard, work in enumerate(shards):
+            processes.append(self._context.Process(
+                target=_worker,
+                args=(kind, work, params, self._client_kwargs, self._bucket, results, shard, self.batch_size),
+                daemon=True
+            ))
+
+        loop = asyncio.get_event_loop()
+        recent = _RecentIds(self.dedupe_window)
+        running = set(range(len(processes)))
+        try:
+            for process in processes:
+                process.start()
+
+            while running:
+                message = await loop.run_in_executor(None, _get, results, 0.1)
+                if message is None:
+                    # Workers report failures themselves; a non-zero exit code means one was killed.
+                    for shard in running:
+                        if processes[shard].exitcode not in (None, 0):
+                            raise errors.WorkerError(shard, "exited with code {}".format(processes[shard].exitcode))
+                    continue
+
+                what, shard, payload = message
+                if what == "error":
+                    raise errors.WorkerError(shard, payload)
+                elif what == "done":
+                    running.discard(shard)
+                    continue
+
+                for row in payload:
+                    if recent.add(row["id"]):
+                        yield row
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+            for process in processes:
+                if process.pid is not None:
+                    process.join()
+
+            results.close()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+        self._pending = {}
+
+    async def do(self, key, func):
+        # Concurrent callers with the same key share one call of func().
+        self.calls += 1
+
+        if key in self._pending:
+            self.coalesced += 1
+            future = self._pending[key]
+        else:
+            self.executed += 1
+            future = asyncio.ensure_future(func())
+            self._pending[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+
+        # Shielded, so one caller giving up doesn't cancel the others.
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+
+        # Mark the exception as retrieved in case every waiter was cancelled.
+        if not future.cancelled():
+            future.exception()
+
+    def in_flight(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight()
+        }
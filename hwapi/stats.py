@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import time
+import bisect
+import collections
+
+import cachetools
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+HOOK_EVENTS = ("on_request_start", "on_request_end")
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th quantile.
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(self.buckets + (float("inf"),), self.counts))
+        }
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.cache_hits = 0
+        self.rate_limit_wait = 0.0
+        self.status = collections.Counter()
+        self.latency = Histogram(LATENCY_BUCKETS)
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_received": self.bytes_received,
+            "cache_hits": self.cache_hits,
+            "rate_limit_wait": self.rate_limit_wait,
+            "status": dict(self.status),
+            "latency": self.latency.snapshot()
+        }
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None
+        }
+
+
+class CountingTTLCache(cachetools.TTLCache):
+    # TTLCache that counts entries evicted for space or expired.
+
+    def __init__(self, maxsize, ttl, stats):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.stats = stats
+
+    def popitem(self):
+        item = super().popitem()
+        self.stats.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if expired:
+            self.stats.evictions += len(expired)
+        return expired
+
+
+class _ParseTimer:
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Stats:
+
+    def __init__(self, hooks=None):
+        self.endpoints = collections.defaultdict(EndpointStats)
+        self.parse = collections.defaultdict(lambda: Histogram(PARSE_BUCKETS))
+        self.caches = collections.defaultdict(CacheStats)
+
+        self.hooks = {event: [] for event in HOOK_EVENTS}
+        for event, callbacks in (hooks or {}).items():
+            for callback in (callbacks if isinstance(callbacks, (list, tuple)) else [callbacks]):
+                self.add_hook(event, callback)
+
+    def add_hook(self, event, callback):
+        if not event in self.hooks:
+            raise ValueError("invalid hook event: {}".format(event))
+
+        self.hooks[event].append(callback)
+
+    def remove_hook(self, event, callback):
+        self.hooks[event].remove(callback)
+
+    def emit(self, event, info):
+        for callback in self.hooks[event]:
+            callback(info)
+
+    def parse_timer(self, kind):
+        return _ParseTimer(self.parse[kind])
+
+    def snapshot(self):
+        return {
+            "endpoints": {name: endpoint.snapshot() for name, endpoint in self.endpoints.items()},
+            "parse": {kind: histogram.snapshot() for kind, histogram in self.parse.items()},
+            "caches": {name: cache.snapshot() for name, cache in self.caches.items()}
+        }
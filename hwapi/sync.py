@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+
+from .paginate import past_end, is_last, learn_page_size
+from .prefetch import PagePrefetcher
+
+
+class SyncCheckpoint:
+
+    # Per-listing sync state, kept in a JSON file when a path is given. "mark" is the
+    # newest item ({"id", "date"}) of the last completed sync; "progress" describes a
+    # sync that was interrupted: the last fully consumed page, the smallest id yielded
+    # so far and the mark that sync will set once it completes.
+
+    def __init__(self, path=None):
+        self.path = path
+        self._streams = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._streams = json.load(f)
+
+    def mark(self, key):
+        return self._streams.get(key, {}).get("mark")
+
+    def progress(self, key):
+        return self._streams.get(key, {}).get("progress")
+
+    def keys(self):
+        return list(self._streams)
+
+    def set_progress(self, key, progress):
+        self._streams.setdefault(key, {"mark": None})["progress"] = dict(progress)
+        self.save()
+
+    def complete(self, key, mark):
+        self._streams[key] = {"mark": mark, "progress": None}
+        self.save()
+
+    def reset(self, key=None):
+        if key is None:
+            self._streams = {}
+        else:
+            self._streams.pop(key, None)
+        self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint.
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._streams, f)
+        os.replace(tmp_path, self.path)
+
+
+async def sync(checkpoint, key, fetch_page, parse_page, *, date_field, prefetch=0, page_sizes=None, page_key=None):
+    # Walks a newest-first listing, yielding items newer than the checkpoint's mark.
+    # fetch_page(page) returns the raw response; parse_page(raw) is a coroutine returning
+    # a list of models, or None if unparseable. Progress is saved after each fully
+    # consumed page, so an interrupted sync resumes after it; items of a partly consumed
+    # page are yielded again. The listing ends as in paginate.Paginator; page_sizes and
+    # page_key share the learned page size with it.
+    mark = checkpoint.mark(key)
+    progress = checkpoint.progress(key) or {"page": 0, "oldest_id": None, "newest": None}
+    page_sizes = page_sizes if page_sizes is not None else {}
+
+    page = progress["page"] + 1
+    pages = PagePrefetcher(fetch_page, page, prefetch=prefetch)
+    previous_ids = frozenset()
+    previous_size = 0
+    try:
+        async for raw_metadata in pages:
+            items = await parse_page(raw_metadata)
+            if items is None:
+                # Leave the progress in place; the next sync retries this page.
+                return
+
+            ids = frozenset(item.id for item in items)
+            if past_end(ids, previous_ids):
+                break
+
+            if previous_ids:
+                # The previous page wasn't the last one, so it was full.
+                learn_page_size(page_sizes, page_key, previous_size)
+
+            page_size = page_sizes.get(page_key)
+            if page_size is not None and len(items) > page_size:
+                page_size = learn_page_size(page_sizes, page_key, len(items))
+
+            previous_ids = ids
+            previous_size = len(items)
+
+            reached_mark = False
+            for item in items:
+                if mark is not None and item.id <= mark["id"]:
+                    reached_mark = True
+                    break
+
+                # After a resume, newer uploads shift items we already yielded onto
+                # later pages. Uploads newer than the pending mark are left for the next sync.
+                if progress["oldest_id"] is not None and item.id >= progress["oldest_id"]:
+                    continue
+
+                if progress["newest"] is None:
+                    progress["newest"] = {"id": item.id, "date": getattr(item, date_field)}
+
+                yield item
+
+            if reached_mark or is_last(len(items), page_size):
+                break
+
+            progress["page"] = page
+            progress["oldest_id"] = min(ids) if progress["oldest_id"] is None else min(min(ids), progress["oldest_id"])
+            checkpoint.set_progress(key, progress)
+            page += 1
+    finally:
+        pages.close()
+
+    checkpoint.complete(key, progress["newest"] or mark)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import array
+import calendar
+import datetime
+
+from . import models
+from . import utils
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_NUMERIC_COLUMNS = (
+    ("id", "q", "@id", int),
+    ("plays", "q", "@ps", int),
+    ("votes", "q", "@vs", int),
+    ("weighted_rating", "d", "@rg", float),
+    ("character", "b", "@pc", int),
+    ("author_id", "q", "@ui", int)
+)
+
+COLUMNS = tuple(name for name, _, _, _ in _NUMERIC_COLUMNS) + ("date_published",)
+
+_RAW_INDEX = {field: index for index, field in enumerate(models.LEVEL_FIELDS)}
+
+
+def _parse_date(s):
+    # Seconds since the epoch (UTC) for "YYYY-MM-DD" and "YYYY-MM-DD HH:MM:SS", else None.
+    try:
+        if len(s) == 10 and s[4] == s[7] == "-":
+            return calendar.timegm((int(s[0:4]), int(s[5:7]), int(s[8:10]), 0, 0, 0))
+
+        if len(s) == 19 and s[4] == s[7] == "-" and s[13] == s[16] == ":":
+            return calendar.timegm((
+                int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                int(s[11:13]), int(s[14:16]), int(s[17:19])
+            ))
+    except (TypeError, ValueError):
+        pass
+
+    return None
+
+
+def _format_date(seconds, with_time):
+    date = datetime.datetime.utcfromtimestamp(seconds)
+    return date.strftime("%Y-%m-%d %H:%M:%S" if with_time else "%Y-%m-%d")
+
+
+class LevelTable:
+
+    # Columns are array.array (numpy views when numpy is installed). date_published is
+    # stored as epoch seconds, or as a list of strings if any date has another format.
+
+    def __init__(self, columns):
+        self._columns = columns
+
+    @classmethod
+    def from_levels(cls, levels):
+        builder = _Builder()
+        for level in levels:
+            builder.append(level)
+
+        return builder.build()
+
+    @classmethod
+    async def collect(cls, levels, limit=None):
+        # Builds a table from an async iterable such as client.levels(...).
+        builder = _Builder()
+        async for level in levels:
+            builder.append(level)
+            if limit is not None and len(builder) >= limit:
+                break
+
+        return builder.build()
+
+    def __len__(self):
+        return len(self._columns["id"])
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    @property
+    def columns(self):
+        return COLUMNS
+
+    @property
+    def dates_as_strings(self):
+        return isinstance(self._columns["date_published"], list)
+
+    def column(self, name):
+        column = self._columns[name]
+        if numpy is not None and isinstance(column, array.array):
+            return numpy.frombuffer(column, dtype=column.typecode)
+
+        return column
+
+    def average_ratings(self):
+        return utils.average_ratings(self.column("weighted_rating"), self.column("votes"))
+
+    def rows(self):
+        for i in range(len(self)):
+            yield {name: self._columns[name][i] for name in COLUMNS}
+
+    def filter(self, mask):
+        # mask is a sequence of booleans, e.g. table["plays"] > 1000 with numpy.
+        if numpy is not None:
+            return self._take(numpy.flatnonzero(numpy.asarray(mask, dtype=bool)))
+
+        return self._take([i for i, keep in enumerate(mask) if keep])
+
+    def sort(self, key, reverse=False):
+        # key is a column name, or "average_rating".
+        if key == "average_rating":
+            values = self.average_ratings()
+        else:
+            values = self.column(key)
+
+        if numpy is not None and not isinstance(values, list):
+            order = numpy.argsort(values, kind="stable")
+            if reverse:
+                order = order[::-1]
+        else:
+            order = sorted(range(len(values)), key=values.__getitem__, reverse=reverse)
+
+        return self._take(order)
+
+    def head(self, n):
+        return self._take(range(min(n, len(self))))
+
+    def _take(self, indices):
+        columns = {}
+        for name, column in self._columns.items():
+            if isinstance(column, list):
+                columns[name] = [column[i] for i in indices]
+            elif numpy is not None:
+                columns[name] = array.array(column.typecode, self.column(name)[numpy.asarray(indices, dtype=numpy.intp)].tobytes())
+            else:
+                columns[name] = array.array(column.typecode, (column[i] for i in indices))
+
+        return LevelTable(columns)
+
+
+class _Builder:
+
+    def __init__(self):
+        self.columns = {name: array.array(typecode) for name, typecode, _, _ in _NUMERIC_COLUMNS}
+        self.columns["date_published"] = array.array("q")
+        self._with_time = None
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def append(self, level):
+        # Reads the undecoded attribute tuple, so no User/Character objects are built.
+        raw = level._raw
+        for name, _, field, convert in _NUMERIC_COLUMNS:
+            self.columns[name].append(convert(raw[_RAW_INDEX[field]]))
+
+        self._append_date(raw[_RAW_INDEX["@dp"]])
+
+    def _append_date(self, s):
+        dates = self.columns["date_published"]
+        if isinstance(dates, list):
+            dates.append(s)
+            return
+
+        seconds = _parse_date(s)
+        with_time = s is not None and len(s) == 19
+        if seconds is not None and self._with_time in (None, with_time):
+            self._with_time = with_time
+            dates.append(seconds)
+        else:
+            # Fall back to strings for the whole column; the known format round-trips.
+            self.columns["date_published"] = [_format_date(d, self._with_time) for d in dates] + [s]
+
+    def build(self):
+        return LevelTable(self.columns)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+
+import cachetools
+
+
+SNAPSHOT_VERSION = 1
+
+
+def approximate_size(obj):
+    # Rough memory footprint of plain data: the object plus everything it holds.
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approximate_size(key) + approximate_size(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            size += approximate_size(value)
+
+    return size
+
+
+def user_data(user):
+    # The data a User was built from, enough to rebuild it with models.User(data=...).
+    if user._data is not None:
+        return user._data
+
+    return {"active": user.active, "name": user.name, "id": user.id}
+
+
+def is_negative(user):
+    # Inactive accounts and profiles without any fields rarely change.
+    return not user.active or not user_data(user).get("profile_table")
+
+
+class _Entry:
+
+    __slots__ = ("user", "size", "expires_at")
+
+    def __init__(self, user, size, expires_at):
+        self.user = user
+        self.size = size
+        self.expires_at = expires_at
+
+
+class _EntryCache(cachetools.TLRUCache):
+    # LRU bounded by the summed entry sizes (and optionally a count), where each entry
+    # expires at its own wall-clock time. Counts evictions like CountingTTLCache.
+
+    def __init__(self, max_bytes, max_entries, stats):
+        super().__init__(
+            maxsize=max_bytes,
+            ttu=lambda key, entry, now: now + entry.expires_at - time.time(),
+            getsizeof=lambda entry: entry.size
+        )
+        self.max_entries = max_entries
+        self.stats = stats
+
+    def __setitem__(self, key, entry):
+        super().__setitem__(key, entry)
+        while self.max_entries is not None and len(self) > self.max_entries:
+            self.popitem()
+
+    def popitem(self):
+        item = super().popitem()
+        self.stats.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if expired:
+            self.stats.evictions += len(expired)
+        return expired
+
+
+class UserCache:
+
+    # Users by requested id, bounded by their approximate size in memory. Inactive users
+    # and empty profiles are kept for negative_ttl seconds, everything else for ttl. An
+    # entry larger than max_bytes isn't cached. save() and load() keep the cache in a JSON
+    # file; entries keep their expiry times, so a reload doesn't extend them.
+
+    def __init__(self, *, max_bytes, ttl, negative_ttl, stats, max_entries=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries = _EntryCache(max_bytes, max_entries, stats)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+    @property
+    def max_bytes(self):
+        return self._entries.maxsize
+
+    @property
+    def bytes(self):
+        return self._entries.currsize
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        return entry.user if entry is not None else None
+
+    def __setitem__(self, user_id, user):
+        ttl = self.negative_ttl if is_negative(user) else self.ttl
+        self._store(user_id, user, time.time() + ttl)
+
+    def _store(self, user_id, user, expires_at):
+        # The key and the entry's own slots count towards the size as well.
+        size = approximate_size(user_data(user)) + sys.getsizeof(user) + sys.getsizeof(user_id) + 64
+        if size > self.max_bytes:
+            self._entries.pop(user_id, None)
+            return
+
+        self._entries[user_id] = _Entry(user, size, expires_at)
+
+    def negatives(self):
+        return sum(1 for entry in self._entries.values() if is_negative(entry.user))
+
+    def save(self, path):
+        # Write to a temporary file first so a crash never leaves a truncated snapshot.
+        self._entries.expire()
+        users = [
+            {"id": user_id, "data": user_data(entry.user), "expires_at": entry.expires_at}
+            for user_id, entry in self._entries.items()
+        ]
+
+        tmp_path = "{}.tmp".format(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "users": users}, f)
+        os.replace(tmp_path, path)
+        return len(users)
+
+    def load(self, path, make_user):
+        # make_user(user_id, data) rebuilds a User. Returns the number of users loaded;
+        # expired entries and a missing file are skipped.
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("unsupported user cache snapshot version: {}".format(snapshot.get("version")))
+
+        now = time.time()
+        loaded = 0
+        for item in snapshot["users"]:
+            if item["expires_at"] <= now:
+                continue
+
+            self._store(item["id"], make_user(item["id"], item["data"]), item["expires_at"])
+            loaded += 1
+
+        return loaded
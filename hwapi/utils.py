@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+RATING_PRIOR_VOTES = 10
+RATING_PRIOR_MEAN = 2.5
+
+
 def average_rating(weighted_rating, num_votes):
-    a = 10
-    b = 2.5
+    a = RATING_PRIOR_VOTES
+    b = RATING_PRIOR_MEAN
 
     if num_votes == 0:
         c = 0
@@ -10,3 +20,22 @@ def average_rating(weighted_rating, num_votes):
         c = (weighted_rating - b * a / (num_votes + a)) / (num_votes / (num_votes + a))
 
     return round(min(5, max(c, 0)), 2)
+
+
+def average_ratings(weighted_ratings, num_votes):
+    # Vectorized average_rating over two equally long sequences. Returns a numpy array
+    # if numpy is installed, otherwise a list.
+    if numpy is None:
+        return [average_rating(w, v) for w, v in zip(weighted_ratings, num_votes)]
+
+    a = RATING_PRIOR_VOTES
+    b = RATING_PRIOR_MEAN
+
+    w = numpy.asarray(weighted_ratings, dtype=numpy.float64)
+    v = numpy.asarray(num_votes, dtype=numpy.float64)
+
+    c = numpy.zeros_like(w)
+    voted = v != 0
+    c[voted] = (w[voted] - b * a / (v[voted] + a)) / (v[voted] / (v[voted] + a))
+
+    return numpy.round(numpy.clip(c, 0, 5), 2)
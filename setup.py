@@ -19,12 +19,16 @@ setup(
 
     packages=find_packages(),
     install_requires=[
-        "cachetools",
+        "cachetools>=5",
         "xmltodict",
         "aiohttp>3",
         "beautifulsoup4>4, <5"
     ],
-    python_requires='>=3.6.0',
+    extras_require={
+        "numpy": ["numpy"],
+        "parquet": ["pyarrow"]
+    },
+    python_requires='>=3.7.0',
     project_urls={
         'Bug Reports': 'https://github.com/kittenswolf/hwapi/issues',
         'Source': 'https://github.com/kittenswolf/hwapi/'